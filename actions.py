@@ -0,0 +1,453 @@
+# actions.py
+
+import asyncio
+import copy
+import discord
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from templates import Template, Constant, DictTemplate, compile_template
+from outbox import get_priority
+from scripts import Script
+from metrics import metrics
+from profiler import profiler
+from variables import get_scope, get_owner
+
+ActionStep = Callable[['ActionContext'], Awaitable[None]]
+ActionFactory = Callable[[Template, Template], ActionStep]
+
+actions: Dict[str, ActionFactory] = {}
+views_list: Dict[str, Callable] = {}
+modals_list: Dict[str, Callable] = {}
+
+concurrent_actions: Set[str] = set()
+
+NOT_ACTIONS = ('@attributes', 'argument', 'permissions', 'filter', 'cooldown', 'max_concurrency')
+DEFAULT_PARALLEL_LIMIT = 5
+
+class ResponseBatch:
+    __slots__ = ('messages', 'added_roles', 'removed_roles')
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.added_roles: Set[int] = set()
+        self.removed_roles: Set[int] = set()
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        self.messages.append(dict(kwargs, content=content))
+
+    def edit_role(self, role_id: int, add: bool):
+        if add:
+            self.added_roles.add(role_id)
+            self.removed_roles.discard(role_id)
+        else:
+            self.removed_roles.add(role_id)
+            self.added_roles.discard(role_id)
+
+    def get_message(self) -> Optional[Dict[str, Any]]:
+        if not self.messages:
+            return None
+
+        content = '\n'.join(str(message['content']) for message in self.messages if message.get('content'))
+        embeds = []
+        view = None
+        for message in self.messages:
+            if message.get('embed') is not None:
+                embeds.append(message['embed'])
+            embeds.extend(message.get('embeds') or ())
+            view = message.get('view') or view
+
+        data: Dict[str, Any] = {'ephemeral': any(message.get('ephemeral', False) for message in self.messages)}
+        if content:
+            data['content'] = content
+        if embeds:
+            data['embeds'] = embeds[:10]
+        if view is not None:
+            data['view'] = view
+        return data
+
+    async def flush(self, interaction: discord.Interaction):
+        member = interaction.user
+        if (self.added_roles or self.removed_roles) and isinstance(member, discord.Member):
+            # Only the net change is sent, role changes made by others in the meantime are kept.
+            current = {role.id for role in member.roles}
+            added = [discord.Object(id=role_id) for role_id in self.added_roles if role_id not in current]
+            removed = [discord.Object(id=role_id) for role_id in self.removed_roles if role_id in current]
+            if added:
+                await member.add_roles(*added)
+            if removed:
+                await member.remove_roles(*removed)
+
+        data = self.get_message()
+        if data is None:
+            return
+        if interaction.response.is_done():
+            await interaction.followup.send(**data)
+        else:
+            await interaction.response.send_message(**data)
+
+class ActionContext:
+    __slots__ = ('bot', 'vars', 'send', 'reply', 'interaction', 'batch', 'channel')
+
+    def __init__(self, bot, vars: Dict[str, Any], send: Optional[Callable] = None, reply: Optional[Callable] = None, interaction: Optional[discord.Interaction] = None, batch: Optional[ResponseBatch] = None, channel: Optional[discord.abc.Messageable] = None):
+        self.bot = bot
+        self.vars = vars
+        self.send = send
+        self.reply = reply
+        self.interaction = interaction
+        self.batch = batch
+        self.channel = channel
+
+    @classmethod
+    def from_context(cls, ctx, vars: Dict[str, Any]) -> 'ActionContext':
+        return cls(ctx.bot, vars, ctx.send, ctx.reply, channel=ctx.channel)
+
+    @classmethod
+    def from_message(cls, bot, message: discord.Message, vars: Dict[str, Any]) -> 'ActionContext':
+        return cls(bot, vars, message.channel.send, message.reply, channel=message.channel)
+
+    @classmethod
+    def from_interaction(cls, interaction: discord.Interaction, vars: Dict[str, Any], batch: Optional[ResponseBatch] = None) -> 'ActionContext':
+        channel = interaction.channel
+        return cls(
+            interaction.client,
+            vars,
+            channel.send if channel else None,
+            batch.send_message if batch is not None else interaction.response.send_message,
+            interaction,
+            batch,
+            channel
+        )
+
+class ActionPlan:
+    __slots__ = ('steps',)
+
+    def __init__(self, steps: tuple):
+        self.steps = steps
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    async def run(self, context: ActionContext):
+        for step in self.steps:
+            await step(context)
+
+class ParallelPlan(ActionPlan):
+    __slots__ = ('stages', 'limit')
+
+    def __init__(self, steps: tuple, stages: tuple, limit: int = DEFAULT_PARALLEL_LIMIT):
+        super().__init__(steps)
+        self.stages = stages
+        self.limit = limit
+
+    async def run(self, context: ActionContext):
+        for stage in self.stages:
+            if len(stage) == 1:
+                await stage[0](context)
+                continue
+
+            if len(stage) <= self.limit:
+                results = await asyncio.gather(*(step(context) for step in stage), return_exceptions=True)
+            else:
+                semaphore = asyncio.Semaphore(self.limit)
+
+                async def run_step(step: ActionStep):
+                    async with semaphore:
+                        await step(context)
+
+                results = await asyncio.gather(*(run_step(step) for step in stage), return_exceptions=True)
+
+            # Every step of the stage gets to run, then the first error stops the plan like in a sequential plan.
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+def action(name: str, concurrent: bool = False) -> Callable[[ActionFactory], ActionFactory]:
+    def decorator(factory: ActionFactory) -> ActionFactory:
+        actions[name] = factory
+        if concurrent:
+            concurrent_actions.add(name)
+        else:
+            concurrent_actions.discard(name)
+        return factory
+    return decorator
+
+def split_action(data: Any) -> tuple:
+    if isinstance(data, dict):
+        attributes = data.get('@attributes', {})
+        payload = data['#text'] if '#text' in data else {k: v for k, v in data.items() if k != '@attributes'}
+        return payload, attributes
+    return data, {}
+
+def compile_step(action_name: str, data: Any) -> Optional[ActionStep]:
+    factory = actions.get(action_name)
+    if factory is None:
+        return None
+
+    payload, attributes = split_action(data)
+    return factory(compile_template(payload), compile_template(attributes))
+
+def get_stages(steps: list) -> tuple:
+    # Concurrent actions next to each other share a stage, any other action waits for the previous stage and runs alone.
+    stages = []
+    current = []
+    for action_name, step in steps:
+        if action_name in concurrent_actions:
+            current.append(step)
+            continue
+        if current:
+            stages.append(tuple(current))
+            current = []
+        stages.append((step,))
+    if current:
+        stages.append(tuple(current))
+    return tuple(stages)
+
+def compile_plan(data: Dict[str, Any], exclude: tuple = NOT_ACTIONS) -> ActionPlan:
+    steps = []
+    for action_name, action_data in data.items():
+        if action_name in exclude:
+            continue
+
+        for item in action_data if isinstance(action_data, list) else (action_data,):
+            step = compile_step(action_name, item)
+            if step is not None:
+                steps.append((action_name, metrics.wrap_action(action_name, profiler.wrap_action(action_name, step))))
+
+    attributes = data.get('@attributes', {}) if isinstance(data, dict) else {}
+    if attributes.get('parallel', False) == True:
+        limit = int(attributes.get('parallel_limit', DEFAULT_PARALLEL_LIMIT))
+        if limit < 1:
+            raise ValueError(f"Invalid parallel_limit: '{limit}'")
+        return ParallelPlan(tuple(step for _, step in steps), get_stages(steps), limit)
+
+    return ActionPlan(tuple(step for _, step in steps))
+
+def hex_to_int(hex_str: str) -> int:
+    hex_str = hex_str.lstrip('#')
+    return int(hex_str, 16)
+
+class StaticEmbed(discord.Embed):
+    # An embed without placeholders is built once and sent by every run. discord.py only reads
+    # embeds when sending, so the payload it asks for is built once as well.
+    def freeze(self) -> 'StaticEmbed':
+        self.payload = super().to_dict()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.payload
+
+    def copy(self) -> discord.Embed:
+        # Copies are changed by whoever made them, they get their own data.
+        return discord.Embed.from_dict(copy.deepcopy(self.payload))
+
+def create_embed(data: dict, embed_class: type = discord.Embed) -> discord.Embed:
+    if 'color' in data:
+        data = dict(data, color=hex_to_int(data['color']))
+    return embed_class(**data)
+
+def get_view(attributes: dict) -> Dict[str, Any]:
+    view = views_list.get(attributes.get('view'))
+    return {'view': view.create()} if view else {}
+
+@action('log', concurrent=True)
+def log_action(payload: Template, attributes: Template) -> ActionStep:
+    render = payload.render
+
+    async def step(context: ActionContext):
+        print(render(context.vars))
+    return step
+
+@action('run_script')
+def run_script_action(payload: Template, attributes: Template) -> ActionStep:
+    if not isinstance(attributes, Constant):
+        raise ValueError("The attributes of <run_script> can't use placeholders")
+    attrs = attributes.value
+    timeout = attrs.get('timeout')
+    script = Script(
+        payload,
+        name=attrs.get('name'),
+        executor=attrs.get('executor'),
+        timeout=float(timeout) if timeout else None,
+        is_async=attrs.get('async', False) == True
+    )
+
+    async def step(context: ActionContext):
+        vars = context.vars
+        namespace = {'bot': context.bot, 'vars': vars, 'interaction': context.interaction, 'ctx': vars.get('ctx')}
+        await script.run(vars, namespace)
+    return step
+
+def get_static_attributes(attributes: Template) -> Dict[str, Any]:
+    if isinstance(attributes, Constant):
+        return attributes.value if isinstance(attributes.value, dict) else {}
+    if isinstance(attributes, DictTemplate):
+        return attributes.constants
+    return {}
+
+def create_sender(attributes: Template) -> Callable:
+    attrs = get_static_attributes(attributes)
+    queue = attrs.get('queue')
+    priority = get_priority(attrs.get('priority'))
+    coalesce = attrs.get('coalesce')
+
+    async def send(context: ActionContext, channel, data: Dict[str, Any]):
+        outbox = context.bot.outbox
+        if outbox.use(queue):
+            await outbox.put(channel, data, priority, coalesce)
+        else:
+            await channel.send(**data)
+    return send
+
+@action('channel_message', concurrent=True)
+def channel_message_action(payload: Template, attributes: Template) -> ActionStep:
+    send = create_sender(attributes)
+
+    if isinstance(attributes, Constant):
+        # The ID is known now, so sends can go through a PartialMessageable without fetching the channel.
+        channel_id = int(attributes.value.get('id', '0'))
+
+        async def step(context: ActionContext):
+            channel = context.bot.channel_cache.get_partial(channel_id)
+            await send(context, channel, payload.render(context.vars))
+        return step
+
+    async def step(context: ActionContext):
+        vars = context.vars
+        channel_id = int(attributes.render(vars).get('id', '0'))
+        channel = await context.bot.channel_cache.get(channel_id)
+        if channel:
+            await send(context, channel, payload.render(vars))
+    return step
+
+def create_send_action(target: str, embed: bool) -> ActionFactory:
+    def factory(payload: Template, attributes: Template) -> ActionStep:
+        send_queued = create_sender(attributes) if target == 'send' else None
+
+        static = None
+        if isinstance(payload, Constant):
+            static = {'embed': create_embed(payload.value, StaticEmbed).freeze()} if embed else payload.value
+
+        async def step(context: ActionContext):
+            send = getattr(context, target)
+            if send is None:
+                return
+
+            vars = context.vars
+            if static is not None:
+                data = static
+            elif embed:
+                data = {'embed': create_embed(payload.render(vars))}
+            else:
+                data = payload.render(vars)
+
+            # send(**data) copies the keyword arguments, the shared dict itself is never changed.
+            view = get_view(attributes.render(vars))
+            if view:
+                data = {**data, **view}
+
+            if send_queued is not None and context.channel is not None:
+                await send_queued(context, context.channel, data)
+            else:
+                await send(**data)
+        return step
+    return factory
+
+action('message', concurrent=True)(create_send_action('send', embed=False))
+action('embed', concurrent=True)(create_send_action('send', embed=True))
+action('reply_message', concurrent=True)(create_send_action('reply', embed=False))
+action('reply_embed', concurrent=True)(create_send_action('reply', embed=True))
+
+def get_member(context: ActionContext) -> Optional[discord.Member]:
+    if context.interaction is not None:
+        user = context.interaction.user
+    else:
+        user = getattr(context.vars.get('ctx'), 'author', None)
+    return user if isinstance(user, discord.Member) else None
+
+def create_role_action(add: bool) -> ActionFactory:
+    def factory(payload: Template, attributes: Template) -> ActionStep:
+        async def step(context: ActionContext):
+            vars = context.vars
+            role_id = int(attributes.render(vars).get('id') or payload.render(vars))
+            if context.batch is not None:
+                context.batch.edit_role(role_id, add)
+                return
+
+            member = get_member(context)
+            if member is None:
+                return
+            if add:
+                await member.add_roles(discord.Object(id=role_id))
+            else:
+                await member.remove_roles(discord.Object(id=role_id))
+        return step
+    return factory
+
+action('add_role', concurrent=True)(create_role_action(add=True))
+action('remove_role', concurrent=True)(create_role_action(add=False))
+
+@action('response')
+def response_action(payload: Template, attributes: Template) -> ActionStep:
+    attrs = attributes.value if isinstance(attributes, Constant) else {}
+    action_type = attrs.get('type')
+
+    if action_type == 'message':
+        async def step(context: ActionContext):
+            if context.interaction is not None:
+                await context.reply(**payload.render(context.vars))
+
+    elif action_type == 'defer':
+        async def step(context: ActionContext):
+            if context.interaction is not None:
+                await context.interaction.response.defer(
+                    ephemeral=attrs.get('ephemeral', False),
+                    thinking=attrs.get('thinking', False)
+                )
+
+    elif action_type == 'modal':
+        async def step(context: ActionContext):
+            if context.interaction is not None:
+                await context.interaction.response.send_modal(modals_list[attrs['name']]())
+
+    else:
+        raise ValueError(f"Invalid response type: '{action_type}'")
+
+    return step
+
+def get_attribute_names(attributes: Template) -> Set[str]:
+    names = set(get_static_attributes(attributes))
+    if isinstance(attributes, DictTemplate):
+        names.update(key for key, _ in attributes.fields)
+    return names
+
+def create_variable_action(operation: str) -> ActionFactory:
+    def factory(payload: Template, attributes: Template) -> ActionStep:
+        names = get_attribute_names(attributes)
+        if 'name' not in names:
+            raise ValueError(f'<{operation}_var> needs a name')
+        if operation == 'set' and 'value' not in names:
+            raise ValueError('<set_var> needs a value')
+        static = get_static_attributes(attributes)
+        if 'scope' in names and 'scope' not in static:
+            raise ValueError(f'The scope of <{operation}_var> can\'t use placeholders')
+        scope = get_scope(static.get('scope'))
+
+        async def step(context: ActionContext):
+            vars = context.vars
+            attrs = attributes.render(vars)
+            id = attrs.get('id')
+            owner = get_owner(scope, getattr(vars, 'subject', None), int(id) if id else None)
+            name = str(attrs['name'])
+            store = context.bot.variables
+
+            if operation == 'set':
+                store.set(owner, name, attrs['value'])
+            elif operation == 'increment':
+                store.increment(owner, name, attrs.get('by', 1))
+            else:
+                store.delete(owner, name)
+        return step
+    return factory
+
+action('set_var')(create_variable_action('set'))
+action('increment_var')(create_variable_action('increment'))
+action('delete_var')(create_variable_action('delete'))
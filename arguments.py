@@ -0,0 +1,93 @@
+# arguments.py
+
+import json
+import discord
+from discord import app_commands
+
+def to_str(value):
+    return value
+
+def to_int(value) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Expected an integer, got '{value}'")
+
+def to_list(value: str) -> list:
+    return value.split()
+
+def to_json(value: str):
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON format: '{value}'")
+
+converters = {
+    'str': to_str, 'string': to_str, 'text': to_str,
+    'int': to_int, 'integer': to_int, 'number': to_int, 'numb': to_int,
+    'list': to_list, 'array': to_list,
+    'dict': to_json, 'dictionary': to_json, 'json': to_json
+}
+
+def get_converter(arg_type: str):
+    return converters.get(arg_type, to_str)
+
+class ListTransformer(app_commands.Transformer):
+    async def transform(self, interaction: discord.Interaction, value: str) -> list:
+        return to_list(value)
+
+class JSONTransformer(app_commands.Transformer):
+    async def transform(self, interaction: discord.Interaction, value: str):
+        return to_json(value)
+
+slash_types = {
+    'str': str, 'string': str, 'text': str,
+    'int': int, 'integer': int, 'number': int, 'numb': int,
+    'list': ListTransformer, 'array': ListTransformer,
+    'dict': JSONTransformer, 'dictionary': JSONTransformer, 'json': JSONTransformer
+}
+
+def get_argument_list(data: dict) -> tuple:
+    arg_list = data.get('argument', [])
+    if isinstance(arg_list, dict):
+        arg_list = [arg_list]
+
+    arguments = []
+    for arg_def in arg_list:
+        if not isinstance(arg_def, dict) or '@attributes' not in arg_def:
+            raise ValueError("Invalid argument definition")
+        arguments.append(arg_def['@attributes'])
+
+    return tuple(arguments)
+
+class ArgumentSchema:
+    __slots__ = ('positional', 'rest')
+
+    def __init__(self, arguments: tuple):
+        positional = []
+        rest = None
+
+        for attr in arguments:
+            field = f"argument({attr['name']})"
+            if attr.get('rest') in (True, 'true'):
+                rest = field
+                break
+            positional.append((attr['name'], field, get_converter(attr.get('type', 'str'))))
+
+        self.positional = tuple(positional)
+        self.rest = rest
+
+    def check_count(self, args: tuple):
+        if len(args) < len(self.positional):
+            raise ValueError(f"Missing argument: {self.positional[len(args)][0]}")
+
+    def parse(self, args: tuple) -> dict:
+        self.check_count(args)
+        fields = {field: convert(value) for (_, field, convert), value in zip(self.positional, args)}
+        if self.rest is not None:
+            fields[self.rest] = ' '.join(args[len(self.positional):])
+        return fields
+
+    def bind(self, args: tuple) -> dict:
+        self.check_count(args)
+        return {field: convert(value) for (_, field, convert), value in zip(self.positional, args)}
@@ -1,48 +1,43 @@
 # base.py
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ui import View, Button, Select, Modal
 from discord import SelectOption, ButtonStyle, ui, app_commands
 import os
-from typing import Callable, Dict, Any
-from parser import parse
+import asyncio
+import copy
+import inspect
+import sqlite3
+from typing import Callable, Dict, Any, NamedTuple, Optional
+from loader import load_config
+from channels import ChannelCache
+from arguments import ArgumentSchema, get_argument_list, slash_types
+from permissions import get_permissions, check_permissions
+from actions import ActionContext, ActionPlan, ResponseBatch, compile_plan, views_list, modals_list
+from scripts import script_globals, configure_pools, get_script_stats
+from watcher import FileWatcher
+from sync import CommandSyncer, get_guild_ids
+from intents import get_intents, get_event_intents, get_cache_options, print_intents_report
+from utils import print_error, get_token
+from shards import get_shard_options, get_cluster, use_gateway
+from components import ComponentRouter, get_custom_id, as_list
+from scheduler import Scheduler, ScheduledTask
+from filters import EventFilter
+from triggers import Trigger, TriggerSet
+from metrics import metrics
+from profiler import profiler
+from limits import TokenBuckets, ConcurrencyLimit, LoadShedder
+from outbox import Outbox, get_priority
+from variables import VariableStore, Variables
 
 from xml.etree.ElementTree import ParseError as XMLParseError
 
 DEBUG_MODE = False
-
-def print_error(message, details=None):
-    separator = "=" * 50
-    error_header = "ERROR"
-    error_message = message
-    details_header = "Details"
-
-    print(separator)
-    print(f"{error_header:^50}")
-    print(f"{'-' * len(error_header)}")
-    print(f"{error_message}")
-    
-    if details:
-        print(f"{'-' * len(error_header)}")
-        print(f"{details_header:^50}")
-        print(f"{'-' * len(details_header)}")
-        print(f"{details}")
-    
-    print(separator)
-    exit()
-
-def clean_data(data: Dict[str, Any]) -> Dict[str, Any]:
-    if isinstance(data, dict):
-        if '#text' in data:
-            return data['#text']
-        return {k: clean_data(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_data(item) for item in data]
-    return data
+CONFIG_FILE = os.getenv('XMLCORD_CONFIG', 'bot')
 
 try:
-    xml_data = parse('bot')
+    bot_config = load_config(CONFIG_FILE)
 except XMLParseError as e:
     print_error('Failed to parse XML', e)
 except FileNotFoundError:
@@ -51,599 +46,440 @@ except OSError:
     print_error('OS Error', 'Could not read file \'bot.xml\'. Make sure the file is not corrupted and the script can read it.')
 
 if DEBUG_MODE:
-    print(f"Parsed XML Data: {xml_data}")
+    print(f"Loaded XML Data: {bot_config}")
 
-xml_bot = xml_data['bot']
-config = clean_data(xml_bot.get('config', {}))
-commands_list = clean_data(xml_bot.get('commands', {}))
-events = clean_data(xml_bot.get('events', {}))
-xml_tasks = clean_data(xml_bot.get('tasks', {}))
-variables = clean_data(xml_bot.get('variables', {}))
-views = clean_data(xml_bot.get('views', {}))
-modals = clean_data(xml_bot.get('modals', {}))
+config = bot_config['config']
+tags = config['tags']
 
-if DEBUG_MODE:
-    print(20*'-')
-    print(clean_data(xml_bot['views']))
-    print(20*'-')
+ignore_self = tags.get('ignore_self', False)
 
-tags = {k: (v.lower() == 'true') if isinstance(v, str) and v.lower() in {'true', 'false'} else v for item in config.pop('tag', []) if isinstance(item, dict) for k, v in item.get('@attributes', {}).items()}
-config['tags'] = tags
+configure_pools(
+    threads=int(tags.get('script_threads', 0)),
+    processes=int(tags.get('script_processes', 0))
+)
 
-ignore_self = tags.get('ignore_self', False)
+try:
+    intents, intent_reasons = get_intents(bot_config)
+    cache_options = get_cache_options(tags, intents)
+except ValueError as e:
+    print_error('Invalid intents configuration', e)
+
+print_intents_report(intents, intent_reasons, cache_options)
+
+try:
+    shard_options = get_shard_options(tags)
+except ValueError as e:
+    print_error('Invalid sharding configuration', e)
+
+cluster_id, cluster_count = get_cluster()
+primary_cluster = cluster_id == 0
+
+try:
+    metrics.configure(tags, cluster_id)
+except ValueError as e:
+    print_error('Invalid metrics configuration', e)
 
-class Bot(commands.Bot):
+try:
+    profiler.configure(tags, cluster_id)
+except ValueError as e:
+    print_error('Invalid profile configuration', e)
+
+if os.getenv('XMLCORD_GATEWAY'):
+    use_gateway(os.getenv('XMLCORD_GATEWAY'))
+
+if shard_options is not None:
+    print(f"Sharding: cluster {cluster_id + 1}/{cluster_count}, shards {', '.join(map(str, shard_options.get('shard_ids', []))) or 'all'} of {shard_options.get('shard_count', 'auto')}")
+
+class Bot(commands.Bot if shard_options is None else commands.AutoShardedBot):
     def __init__(self):
         super().__init__(
             command_prefix=config.get('prefix', '!'),
-            intents=discord.Intents.all(),
+            intents=intents,
             case_insensitive=tags.get('case_insensitive', False),
             help_command=None,
-            strip_after_prefix=tags.get('strip_after_prefix', False)
+            strip_after_prefix=tags.get('strip_after_prefix', False),
+            **cache_options,
+            http_trace=profiler.create_trace(metrics.create_trace()),
+            **(shard_options or {})
         )
 
-bot = Bot()
-tree = bot.tree
+        self.channel_cache = ChannelCache(
+            self,
+            max_size=int(tags.get('channel_cache_size', 256)),
+            ttl=float(tags.get('channel_cache_ttl', 300))
+        )
+        self.channel_cache.register()
 
-def get_token() -> str:
-    token_from_config = config.get('token')
-    if token_from_config:
-        return token_from_config
-
-    if 'token' in tags:
-        token_tag = tags['token']
-
-        if '.env' in token_tag:
-            try:
-                from dotenv import load_dotenv
-            except ImportError:
-                print_error('Module not found', 'Module \'python-dotenv\' not found. Install it with \'pip install python-dotenv\'.')
-            else:
-                load_dotenv()
-                return os.getenv('TOKEN')
-
-        elif '.yml' in token_tag:
-            try:
-                import yaml
-            except ImportError:
-                print_error('Module not found', 'Module \'pyyaml\' not found. Install it with \'pip install pyyaml\'.')
-            else:
-                with open(token_tag, 'r') as file:
-                    data = yaml.safe_load(file)
-                    return data['token']
-
-        elif '.json' in token_tag:
-            import json
-            with open(token_tag, 'r') as file:
-                data = json.load(file)
-                return data['token']
-
-    print_error('No valid token found', 'Bot token not found. Ensure it\'s in the <token>...</token> tag or in a .env, config.json, or config.yml file. If in a separate file, make sure the correct path is specified in the <token> tag.')
-
-def create_dynamic_command(name: str, function: Callable, slash_function: Callable, prefix: bool=True, slash: bool=True):
-    if prefix:
-        command = commands.Command(function, name=name)
-        bot.add_command(command)
-    
-    if slash:
-        slash_command = app_commands.Command(name=name, description='...', callback=slash_function)
-        tree.add_command(slash_command)
+        self.outbox = Outbox(
+            enabled=tags.get('send_queue', False) == True,
+            max_size=int(tags.get('send_queue_size', 100)),
+            policy=tags.get('send_queue_policy', 'drop_oldest'),
+            coalesce=tags.get('send_queue_coalesce', False) == True
+        )
 
-def hex_to_int(hex_str: str) -> int:
-    hex_str = hex_str.lstrip('#')
-    return int(hex_str, 16)
+        self.component_router = ComponentRouter(self)
+        self.component_router.register()
 
-def convert_argument(value: str, arg_type: str):
-    if arg_type in ['str', 'text', 'string']:
-        return value
-    elif arg_type in ['int', 'number', 'integer']:
+        self.variables = VariableStore(
+            file=str(tags.get('variables_file', 'variables.db')),
+            flush_interval=float(tags.get('variables_flush_interval', 5)),
+            flush_size=int(tags.get('variables_flush_size', 1000)),
+            instance=cluster_id
+        )
         try:
-            return int(value)
-        except ValueError:
-            raise ValueError(f"Expected an integer, got '{value}'")
-    elif arg_type in ['list', 'array']:
-        return value.split()
-    elif arg_type in ['dict', 'json']:
+            self.variables.load()
+        except sqlite3.Error as e:
+            print_error('Could not load variables', e)
+
+    async def close(self):
+        # Changed variables and profiler reports that are not saved yet are written before the bot stops.
+        await self.variables.close()
+        await profiler.flush()
+        await super().close()
+
+bot = Bot()
+tree = bot.tree
+
+def instrument(kind: str, name: str, func: Callable) -> Callable:
+    return metrics.timed(kind, name, profiler.wrap(kind, name, func))
+
+def create_dynamic_command(name: str, function: Callable, slash_function: Callable, prefix: bool=True, slash: bool=True) -> tuple:
+    command = commands.Command(function, name=name) if prefix else None
+    slash_command = app_commands.Command(name=name, description='...', callback=slash_function) if slash else None
+    return command, slash_command
+
+class CommandDefinition(NamedTuple):
+    name: str
+    schema: ArgumentSchema
+    parameters: tuple
+    permissions: int
+    plan: ActionPlan
+    prefix: bool
+    slash: bool
+    cooldown: Optional[TokenBuckets]
+    concurrency: Optional[ConcurrencyLimit]
+    priority: int
+
+def get_slash_parameters(arguments: tuple) -> tuple:
+    parameters = [inspect.Parameter('interaction', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=discord.Interaction)]
+
+    for arg in arguments:
         try:
-            import json
-            return json.loads(value)
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid JSON format: '{value}'")
-    return value
-
-def format_data(data: Any, vars: Dict[str, Any]) -> Any:
-    if isinstance(data, dict):
-        return {k: format_data(v, vars) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [format_data(item, vars) for item in data]
-    elif isinstance(data, str):
-        return data.format(**vars)
-    return data
-
-def create_command_function(data: dict) -> Callable:
+            arg_name = arg['name']
+        except KeyError:
+            raise ValueError('Argument name not provided') from None
+
+        try:
+            arg_type = slash_types[arg.get('type', 'str')]
+        except KeyError:
+            raise ValueError(f"Invalid type of argument '{arg_name}': '{arg.get('type')}'") from None
+
+        parameters.append(inspect.Parameter(arg_name, inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=arg_type))
+
+    return tuple(parameters)
+
+def get_limit_attributes(data: dict, name: str) -> Optional[dict]:
+    limit = data.get(name)
+    if limit is None:
+        return None
+    return limit.get('@attributes', {}) if isinstance(limit, dict) else {'number': limit}
+
+def create_cooldown(data: dict) -> Optional[TokenBuckets]:
+    attr = get_limit_attributes(data, 'cooldown')
+    if attr is None:
+        return None
+    return TokenBuckets(int(attr.get('rate', 1)), float(attr.get('per', 0)), attr.get('bucket', 'user'))
+
+def create_concurrency_limit(data: dict) -> Optional[ConcurrencyLimit]:
+    attr = get_limit_attributes(data, 'max_concurrency')
+    if attr is None:
+        return None
+    return ConcurrencyLimit(int(attr.get('number', 1)), attr.get('bucket', 'global'))
+
+def create_command_definition(name: str, data: dict) -> CommandDefinition:
+    arguments = get_argument_list(data)
+    attr = data.get('@attributes', {})
+
+    return CommandDefinition(
+        name=name,
+        schema=ArgumentSchema(arguments),
+        parameters=get_slash_parameters(arguments) if attr.get('slash', True) else (),
+        permissions=get_permissions(data).value,
+        plan=compile_plan(data),
+        prefix=attr.get('prefix', True),
+        slash=attr.get('slash', True),
+        cooldown=create_cooldown(data),
+        concurrency=create_concurrency_limit(data),
+        priority=get_priority(attr.get('priority'))
+    )
+
+async def run_command(definition: CommandDefinition, subject: Any, context: ActionContext):
+    if definition.concurrency is None:
+        await definition.plan.run(context)
+        return
+
+    key = definition.concurrency.acquire(subject)
+    try:
+        await definition.plan.run(context)
+    finally:
+        definition.concurrency.release(key)
+
+def create_command_function(definition: CommandDefinition) -> Callable:
     async def func(ctx: commands.Context, *args):
-        arguments = {}
-        arg_list = data.get('argument', [])
-        remaining_args = list(args)
-
-        if isinstance(arg_list, dict):
-            arg_list = [arg_list]
-
-        for arg_def in arg_list:
-            if isinstance(arg_def, dict) and '@attributes' in arg_def:
-                attr = arg_def['@attributes']
-                arg_name = attr['name']
-                arg_type = attr.get('type', 'str')
-                rest = attr.get('rest', 'false') == 'true'
-
-                if rest:
-                    arguments[arg_name] = ' '.join(remaining_args)
-                    break
-                else:
-                    if not remaining_args:
-                        raise ValueError(f"Missing argument: {arg_name}")
-                    arg_value = remaining_args.pop(0)
-                    arguments[arg_name] = convert_argument(arg_value, arg_type)
-            else:
-                raise ValueError("Invalid argument definition")
-
-        if 'permissions' in data:
-            permissions_data = data['permissions']
-            permissions = []
-
-            if isinstance(permissions_data, dict):
-                for perm_name, perm_value in permissions_data.items():
-                    if perm_name == '@attributes':
-                        for perm, value in perm_value.items():
-                            if value == True:
-                                permissions.append(perm)
-                    else:
-                        permissions.append(perm_name)
-
-            def check_permissions(perms, user):
-                missing_permissions = [perm for perm in perms if not getattr(user.guild_permissions, perm, False)]
-                if missing_permissions:
-                    raise commands.MissingPermissions(missing_permissions)
-
-            check_permissions(permissions, ctx.author)
-
-        vars = {'ctx': ctx}
-        vars.update({f'argument({k})': v for k, v in arguments.items()})
-        vars.update({f'var({k})': v for k, v in variables.items()})
-
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-            view = views_list.get(action_data.get('@attributes', {}).get('view'))
-
-            if action_name == 'log':
-                print(action_data)
-                
-            elif action_name == 'run_script':
-                exec(action_data)
-                
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
-
-            elif action_name == 'embed':
-                if 'color' in action_data:
-                    action_data['color'] = hex_to_int(action_data['color'])
-                embed = discord.Embed(**action_data)
-                await ctx.send(embed=embed, view=view())
-
-            elif action_name == 'message':
-                action_data.pop('@attributes', None)
-                await ctx.send(**action_data, view=view())
-
-            elif action_name == 'reply_embed':
-                if 'color' in action_data:
-                    action_data['color'] = hex_to_int(action_data['color'])
-                embed = discord.Embed(**action_data)
-                await ctx.reply(embed=embed, view=view())
-
-            elif action_name == 'reply_message':
-                action_data.pop('@attributes', None)
-                await ctx.reply(**action_data, view=view())
+        load_shedder.check(definition.priority)
+        if definition.permissions:
+            check_permissions(definition.permissions, ctx.author)
+        if definition.cooldown is not None:
+            definition.cooldown.check(ctx.message)
 
-    return func
+        vars = Variables(bot.variables, ctx.message, definition.schema.parse(args))
+        vars['ctx'] = ctx
 
-def create_slash_command_function(data: dict) -> Callable:
-    types = {
-        'str': str, 'string': str, 'text': str,
-        'int': int, 'integer': int, 'number': int, 'numb': int,
-        'list': list,
-        'dict': dict, 'dictionary': dict, 'json': dict
-    }
+        await run_command(definition, ctx.message, ActionContext.from_context(ctx, vars))
+
+    return func
 
-    arg_list = data.get('argument', None)
-    arguments = {}
+def create_slash_command_function(definition: CommandDefinition) -> Callable:
+    fields = {parameter.name: f'argument({parameter.name})' for parameter in definition.parameters[1:]}
 
-    if isinstance(arg_list, dict):
-        arg_list = [arg_list]
+    async def func(interaction: discord.Interaction, **arguments):
+        load_shedder.check(definition.priority)
+        if definition.permissions:
+            check_permissions(definition.permissions, interaction.user)
+        if definition.cooldown is not None:
+            definition.cooldown.check(interaction)
 
-    if arg_list:
-        for arg in arg_list:
-            arg = arg.get('@attributes', {})
-            try:
-                arg_name = arg['name']
-            except KeyError:
-                print_error('Argument name not provided')
+        vars = Variables(bot.variables, interaction, {fields[k]: v for k, v in arguments.items()})
+        vars['ctx'] = await commands.Context.from_interaction(interaction)
 
-            try:
-                arg_type = types[arg['type']]
-            except KeyError:
-                print_error('Argument not provided or invalid annotation.')
-            arguments[arg_name] = arg_type
+        await run_command(definition, interaction, ActionContext.from_interaction(interaction, vars))
 
-    args = ', '.join(f"{key}: {value.__name__}" for key, value in arguments.items())
-    
-    body = f"""
-async def dynamic_func(interaction: discord.Interaction, {args}):
-    data = {data}
-    
-    arguments = locals()
-    arguments.pop('data')
-
-    if 'permissions' in data:
-        permissions_data = data['permissions']
-        permissions = []
-
-        if isinstance(permissions_data, dict):
-            for perm_name, perm_value in permissions_data.items():
-                if perm_name == '@attributes':
-                    for perm, value in perm_value.items():
-                        if value == True:
-                            permissions.append(perm)
-                else:
-                    permissions.append(perm_name)
-
-        def check_permissions(perms, user):
-            missing_permissions = [perm for perm in perms if not getattr(user.guild_permissions, perm, False)]
-            if missing_permissions:
-                raise commands.MissingPermissions(missing_permissions)
-
-        check_permissions(permissions, interaction.user)
-
-    vars = {{f'argument({{arg}})': val for arg, val in arguments.items()}}
-    vars.update({{f'var({{k}})': v for k, v in variables.items()}})
-    vars.update({{'ctx': await commands.Context.from_interaction(interaction)}})
-
-    if 'argument' in data:
-        data.pop('argument')
-
-    for action_name, action_data in data.items():
-        action_data = format_data(action_data, vars)
-        view = views_list.get(action_data.get('@attributes', {{}}).get('view'))
-        view = view() if view else None
-
-        if action_name == 'log':
-            print(action_data)
-
-        elif action_name == 'run_script':
-            exec(action_data)
-
-        elif action_name == 'channel_message':
-            channel_id = int(action_data.get('@attributes', {{}}).get('id', '0').format(**vars))
-            channel = await bot.fetch_channel(channel_id)
-            if channel:
-                action_data.pop('@attributes', None)
-                await channel.send(**action_data)
-
-        elif action_name == 'embed':
-            if 'color' in action_data:
-                action_data['color'] = hex_to_int(action_data['color'])
-            embed = discord.Embed(**action_data)
-            await interaction.channel.send(embed=embed, view=view)
-
-        elif action_name == 'message':
-            action_data.pop('@attributes', None)
-            await interaction.channel.send(**action_data, view=view)
-
-        elif action_name == 'reply_embed':
-            if 'color' in action_data:
-                action_data['color'] = hex_to_int(action_data['color'])
-            embed = discord.Embed(**action_data)
-            await interaction.response.send_message(embed=embed, view=view)
-
-        elif action_name == 'reply_message':
-            action_data.pop('@attributes', None)
-            await interaction.response.send_message(**action_data, view=view)
-"""
-
-    exec(body, globals())
-    return globals()['dynamic_func']
+    func.__signature__ = inspect.Signature(definition.parameters)
+    return func
 
 def create_event_function(data: dict, event: str) -> Callable:
+    plan = compile_plan(data)
+    schema = ArgumentSchema(get_argument_list(data))
+
+    if event == 'on_slash_command_error':
+        create_context = lambda args, vars: ActionContext.from_interaction(args[0], vars)
+    elif event == 'on_message':
+        create_context = lambda args, vars: ActionContext.from_message(bot, args[0], vars)
+    else:
+        create_context = lambda args, vars: ActionContext(bot, vars)
+
+    filter_data = data.get('filter')
+    event_filter = EventFilter(event, filter_data.get('@attributes', {}) if isinstance(filter_data, dict) else {}, bot, ignore_self)
+    check = event_filter.check
+
     async def func(*args, **kwargs):
-        if args and hasattr(args[0], 'author') and ignore_self and args[0].author.id == bot.user.id:
+        # Runs before any argument is converted or template rendered, most events stop here.
+        if not check(args):
             return
 
-        arguments = {}
-        if 'argument' in data:
-            arg_list = data.get('argument', [])
-            if isinstance(arg_list, dict):
-                arg_list = [arg_list]
-
-            for i, arg_def in enumerate(arg_list):
-                if isinstance(arg_def, dict) and '@attributes' in arg_def:
-                    attr = arg_def['@attributes']
-                    arg_name = attr['name']
-                    arg_type = attr.get('type', 'str')
-
-                    if i < len(args):
-                        arg_value = args[i]
-                        arguments[arg_name] = convert_argument(arg_value, arg_type)
-                    else:
-                        raise ValueError(f"Missing argument: {arg_name}")
-                else:
-                    raise ValueError("Invalid argument definition")
-
-        vars = {f'argument({k})': v for k, v in arguments.items()}
-        vars.update({f'var({k})': v for k, v in variables.items()})
-
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-
-            if action_name == 'log':
-                print(action_data)
-            elif action_name == 'run_script':
-                exec(action_data)  
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
-
-            if event == 'on_message':
-                if action_name == 'embed':
-                    if 'color' in action_data:
-                        action_data['color'] = hex_to_int(action_data['color'])
-                    embed = discord.Embed(**action_data)
-                    await args[0].channel.send(embed=embed)
-                elif action_name == 'reply_embed':
-                    if 'color' in action_data:
-                        action_data['color'] = hex_to_int(action_data['color'])
-                    embed = discord.Embed(**action_data)
-                    await args[0].reply(embed=embed)
-                elif action_name == 'message':
-                    await args[0].channel.send(**action_data)
-                elif action_name == 'reply_message':
-                    await args[0].reply(**action_data)
-            
-            elif event in ['on_slash_command_error']:
-                if action_name == 'response':
-                    action_type = action_data['@attributes']['type']
-                    if action_type == 'message':
-                        action_data.pop('@attributes', None)
-                        await args[0].response.send_message(**action_data)
-                    elif action_type == 'defer':
-                        await args[0].response.defer(
-                            ephemeral=action_data.get('@attributes', {}).get('ephemeral'),
-                            thinking=action_data.get('@attributes', {}).get('thinking')
-                        )
-                    elif action_type == 'modal':
-                        await args[0].response.send_modal(modals_list[action_data['@attributes']['name']]())
-                    
+        vars = Variables(bot.variables, args[0] if args else None, schema.bind(args))
+
+        await plan.run(create_context(args, vars))
 
+    func.event_filter = event_filter
     return func
 
+def create_trigger(name: str, data: dict) -> Trigger:
+    attr = data.get('@attributes', {})
+    return Trigger(
+        name,
+        str(attr.get('pattern', '')),
+        type=attr.get('type', 'keyword'),
+        case_sensitive=attr.get('case_sensitive', False) == True,
+        whole_word=attr.get('whole_word', False) == True,
+        ignore_bots=attr.get('ignore_bots', True) == True,
+        handler=instrument('trigger', name, compile_plan(data).run)
+    )
+
+async def on_trigger_message(message: discord.Message):
+    if not triggers or not message.content:
+        return
+    if ignore_self and bot.user is not None and message.author.id == bot.user.id:
+        return
+
+    # TriggerSet picks per-trigger checks or one combined pass over the message, depending on the rule count.
+    for trigger, match in triggers.match(message.content):
+        if trigger.ignore_bots and message.author.bot:
+            continue
+
+        vars = Variables(bot.variables, message, {'trigger(message)': message, 'trigger(match)': match, 'trigger(name)': trigger.name})
+        await trigger.handler(ActionContext.from_message(bot, message, vars))
+
 def create_dynamic_loop_function(data: dict) -> Callable:
+    plan = compile_plan(data)
+
     async def func():
-        vars = ({f'var({k})': v for k, v in variables.items()})
-
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-
-            if action_name == 'log':
-                print(action_data)
-            elif action_name == 'run_script':
-                exec(action_data)  
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
+        await plan.run(ActionContext(bot, Variables(bot.variables)))
 
     return func
 
-def create_dynamic_loop(*, name: str, loop_func: Callable[..., Any], hours: float = 0, minutes: float = 0, seconds: float = 0, enabled: bool = False):
-    hours = float(hours) if isinstance(hours, str) else hours
-    minutes = float(minutes) if isinstance(minutes, str) else minutes
-    seconds = float(seconds) if isinstance(seconds, str) else seconds
-
-    @tasks.loop(hours=hours, minutes=minutes, seconds=seconds, name=name)
-    async def dynamic_loop():
-        await loop_func()
-    
-    return dynamic_loop
-
-enabled_loops = []
+def create_scheduled_task(name: str, data: dict) -> ScheduledTask:
+    attr = data.get('@attributes', {})
+    interval = float(attr.get('hours', 0)) * 3600 + float(attr.get('minutes', 0)) * 60 + float(attr.get('seconds', 0))
+
+    return ScheduledTask(
+        name,
+        instrument('task', name, create_dynamic_loop_function(data)),
+        interval=interval or None,
+        cron=attr.get('cron'),
+        jitter=float(attr.get('jitter', 0)),
+        missed=attr.get('missed', 'skip'),
+        max_concurrency=int(attr.get('max_concurrency', 1))
+    )
 
 def create_dynamic_button_function(data: dict):
-    async def func(interaction: discord.Interaction):
-        vars = ({f'var({k})': v for k, v in variables.items()})
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-
-            if action_name == 'log':
-                print(action_data)
-            elif action_name == 'run_script':
-                exec(action_data)  
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
-            elif action_name == 'response':
-                action_type = action_data['@attributes']['type']
-                if action_type == 'message':
-                    action_data.pop('@attributes', None)
-                    await interaction.response.send_message(**action_data)
-                elif action_type == 'defer':
-                    await interaction.response.defer(
-                        ephemeral=action_data.get('@attributes', {}).get('ephemeral'),
-                        thinking=action_data.get('@attributes', {}).get('thinking')
-                    )
-                elif action_type == 'modal':
-                    await interaction.response.send_modal(modals_list[action_data['@attributes']['name']]())
-    
-    return func
+    plan = compile_plan(data)
 
-def create_dynamic_option_function(data: dict):
     async def func(interaction: discord.Interaction):
-        vars = ({f'var({k})': v for k, v in variables.items()})
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-
-            if action_name == 'log':
-                print(action_data)
-            elif action_name == 'run_script':
-                exec(action_data)  
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
-            elif action_name == 'response':
-                action_type = action_data['@attributes']['type']
-                if action_type == 'message':
-                    action_data.pop('@attributes', None)
-                    await interaction.response.send_message(**action_data)
-                elif action_type == 'defer':
-                    await interaction.response.defer(
-                        ephemeral=action_data.get('@attributes', {}).get('ephemeral'),
-                        thinking=action_data.get('@attributes', {}).get('thinking')
-                    )
-                elif action_type == 'modal':
-                    await interaction.response.send_modal(modals[action_data['@attributes']['name']])
+        await plan.run(ActionContext.from_interaction(interaction, Variables(bot.variables, interaction)))
     
     return func
 
-def create_dynamic_modal_function(data: dict, inputs: list) -> Callable:
-    async def func(interaction: discord.Interaction):
-        vars = ({f'var({k})': v for k, v in variables.items()})
-        vars.update({f'inp({k})': v for k, v in inputs.items()})
-        for action_name, action_data in data.items():
-            action_data = format_data(action_data, vars)
-
-            if action_name == 'log':
-                print(action_data)
-            elif action_name == 'run_script':
-                exec(action_data)  
-            elif action_name == 'channel_message':
-                channel_id = int(action_data.get('@attributes', {}).get('id', '0').format(**vars))
-                channel = await bot.fetch_channel(channel_id)
-                if channel:
-                    action_data.pop('@attributes', None)
-                    await channel.send(**action_data)
-            elif action_name == 'response':
-                action_type = action_data['@attributes']['type']
-                if action_type == 'message':
-                    action_data.pop('@attributes', None)
-                    await interaction.response.send_message(**action_data)
-                elif action_type == 'defer':
-                    await interaction.response.defer(
-                        ephemeral=action_data.get('@attributes', {}).get('ephemeral'),
-                        thinking=action_data.get('@attributes', {}).get('thinking')
-                    )
-                elif action_type == 'modal':
-                    await interaction.response.send_modal(modals[action_data['@attributes']['name']])
+def create_dynamic_modal_function(data: dict) -> Callable:
+    plan = compile_plan(data)
+
+    async def func(interaction: discord.Interaction, inputs: dict):
+        vars = Variables(bot.variables, interaction, {f'inp({k})': v for k, v in inputs.items()})
+        await plan.run(ActionContext.from_interaction(interaction, vars))
     
     return func
 
-def create_dynamic_buttons(data: dict) -> Callable:
-    buttons = data['button']
+BUTTON_STYLES = {
+    'primary': ButtonStyle.primary,
+    'blurple': ButtonStyle.primary,
+    'blue': ButtonStyle.primary,
+    'secondary': ButtonStyle.secondary,
+    'gray': ButtonStyle.secondary,
+    'grey': ButtonStyle.secondary,
+    'success': ButtonStyle.success,
+    'green': ButtonStyle.success,
+    'danger': ButtonStyle.danger,
+    'red': ButtonStyle.danger,
+    'link': ButtonStyle.link
+}
+
+def create_dynamic_buttons(name: str, data: dict, handlers: dict) -> list:
     buttons_list = []
-    
-    colors_map = {
-        'primary': ButtonStyle.primary,
-        'blurple': ButtonStyle.primary,
-        'blue': ButtonStyle.primary,
-        'secondary': ButtonStyle.secondary,
-        'gray': ButtonStyle.secondary,
-        'grey': ButtonStyle.secondary,
-        'success': ButtonStyle.success,
-        'green': ButtonStyle.success,
-        'danger': ButtonStyle.danger,
-        'red': ButtonStyle.danger,
-        'link': ButtonStyle.link
-    }
 
-    for button in buttons:
-        class DynamicButton(Button):
-            def __init__(self, btn_data):
-                super().__init__(
-                    style=colors_map[btn_data['style']],
-                    label=btn_data['label'],
-                    disabled=btn_data.get('@attributes', {}).get('disabled', False),
-                    url=btn_data.get('url') if btn_data['style'] == ButtonStyle.link else None,
-                    emoji=btn_data.get('emoji')
-                )
+    for index, button in enumerate(as_list(data.get('button'))):
+        attr = button.get('@attributes', {})
+        style = BUTTON_STYLES[button['style']]
+        options = {
+            'style': style,
+            'label': button['label'],
+            'disabled': attr.get('disabled', False),
+            'emoji': button.get('emoji')
+        }
 
-            async def callback(self, interaction: discord.Interaction, btn_data=button):
-                func = create_dynamic_button_function(btn_data['on_click'])
-                await func(interaction)
+        if style == ButtonStyle.link:
+            options['url'] = button.get('url')
+        else:
+            options['custom_id'] = attr.get('custom_id') or get_custom_id(name, 'button', index)
+            handlers[options['custom_id']] = create_dynamic_button_function(button['on_click'])
 
-        buttons_list.append(DynamicButton(button))
+        buttons_list.append(options)
 
     return buttons_list
 
-def create_dynamic_select_menus(data: dict) -> list:
-    options = data['select_menu']['option']
-    options_list = []
-
-    class DynamicSelect(Select):
-        def __init__(self, select_data):
-            super().__init__(
-                placeholder=select_data.get('@attributes', {}).get('placeholder', 'Choose an option...'),
-                min_values=int(select_data.get('@attributes', {}).get('min_values', 1)),
-                max_values=int(select_data.get('@attributes', {}).get('max_values', 1)),
-                options=[
-                    SelectOption(
-                        label=opt['label'],
-                        value=opt['@attributes']['value'],
-                        description=opt.get('description'),
-                        emoji=opt.get('emoji'),
-                        default='default' in opt.get('@attributes', {})
-                    )
-                    for opt in options
-                ]
-            )
-
-        async def callback(self, interaction: discord.Interaction):
-            for option in options:
-                if option['@attributes']['value'] in self.values:
-                    func = create_dynamic_option_function(option['on_select'])
-                    await func(interaction)
-
-    options_list.append(DynamicSelect(data['select_menu']))
-
-    return options_list
-
-def create_dynamic_view(data: dict) -> Callable:
-    buttons = create_dynamic_buttons(data)
-    select_menus = create_dynamic_select_menus(data)
+def create_dynamic_select_menus(name: str, data: dict, handlers: dict) -> list:
+    select_menus = []
+
+    for index, select_menu in enumerate(as_list(data.get('select_menu'))):
+        attr = select_menu.get('@attributes', {})
+        options = as_list(select_menu.get('option'))
+        custom_id = attr.get('custom_id') or get_custom_id(name, 'select', index)
+
+        select_menus.append({
+            'custom_id': custom_id,
+            'placeholder': attr.get('placeholder', 'Choose an option...'),
+            'min_values': int(attr.get('min_values', 1)),
+            'max_values': int(attr.get('max_values', 1)),
+            'options': [
+                SelectOption(
+                    label=opt['label'],
+                    value=opt['@attributes']['value'],
+                    description=opt.get('description'),
+                    emoji=opt.get('emoji'),
+                    default='default' in opt.get('@attributes', {})
+                )
+                for opt in options
+            ]
+        })
+
+        option_plans = {
+            option['@attributes']['value']: (position, compile_plan(option['on_select']))
+            for position, option in enumerate(options)
+        }
+        batch = attr.get('batch', False) == True
+
+        async def callback(interaction: discord.Interaction, option_plans=option_plans, batch=batch):
+            # Selected values run in the order of the options in bot.xml.
+            selected = sorted(option_plans[value] for value in interaction.data.get('values', ()) if value in option_plans)
+            if not batch:
+                for _, plan in selected:
+                    await plan.run(ActionContext.from_interaction(interaction, Variables(bot.variables, interaction)))
+                return
+
+            response = ResponseBatch()
+            context = ActionContext.from_interaction(interaction, Variables(bot.variables, interaction), response)
+            for _, plan in selected:
+                await plan.run(context)
+            await response.flush(interaction)
+
+        handlers[custom_id] = callback
+
+    return select_menus
+
+def create_dynamic_view(name: str, data: dict) -> tuple:
+    handlers = {}
+    buttons = create_dynamic_buttons(name, data, handlers)
+    select_menus = create_dynamic_select_menus(name, data, handlers)
     
     class DynamicView(View):
+        prototype = None
+        components = None
+
         def __init__(self):
             super().__init__(timeout=None)
 
-            for button in buttons:
-                self.add_item(button)
+            for options in buttons:
+                self.add_item(Button(**options))
             
-            for select_menu in select_menus:
-                self.add_item(select_menu)
+            for options in select_menus:
+                self.add_item(Select(**dict(options, options=list(options['options']))))
+
+        def is_dispatchable(self) -> bool:
+            # Clicks go through bot.component_router, discord.py doesn't need to keep every sent view around.
+            return False
+
+        def to_components(self) -> list:
+            # The buttons and select menus never change, their payload is built on the first send.
+            cls = type(self)
+            if cls.components is None:
+                cls.components = super().to_components()
+            return cls.components
+
+        @classmethod
+        def create(cls) -> 'DynamicView':
+            # discord.py changes the view it is given (e.g. the timeout of ephemeral responses), so every
+            # send gets its own shallow copy of one prebuilt view instead of building the items again.
+            if cls.prototype is None:
+                cls.prototype = cls()
+                # Interaction responses store every view that isn't finished, even when it is not dispatchable.
+                # A stopped view is never stored, and the copies share its stopped state.
+                cls.prototype.stop()
+            return copy.copy(cls.prototype)
     
-    return DynamicView
+    return DynamicView, handlers
+
+def create_dynamic_modal(name: str, data: dict):
+    func = instrument('modal', name, create_dynamic_modal_function(data['on_submit']))
 
-def create_dynamic_modal(data: dict):
     class DynamicModal(Modal):
         def __init__(self):
             super().__init__(timeout=None, title='Zgłoś użytkownika')
@@ -661,72 +497,281 @@ def create_dynamic_modal(data: dict):
 
         async def on_submit(self, interaction: discord.Interaction):
             inputs = {child.label.lower().replace(' ', '_'): child.value for child in self.children if isinstance(child, ui.TextInput)}
-            
-            func = create_dynamic_modal_function(data['on_submit'], inputs)
-            await func(interaction)
+            await func(interaction, inputs)
 
     return DynamicModal
 
-for task_name, task in xml_tasks.items():
-    attr = task['@attributes']
-    func = create_dynamic_loop_function(task)
-    
-    dynamic_loop = create_dynamic_loop(
-        name=task_name,
-        loop_func=func,
-        hours=attr.get('hours', 0),
-        minutes=attr.get('minutes', 0),
-        seconds=attr.get('seconds', 0),
-        enabled=attr.get('enabled', False)
-    )
-    
-    if attr.get('enabled', False) == True:
-        enabled_loops.append(dynamic_loop)
-
-for name, value in commands_list.items():
+command_definitions: Dict[str, CommandDefinition] = {}
+event_functions: Dict[str, Callable] = {}
+event_filters: Dict[str, EventFilter] = {}
+triggers = TriggerSet()
+trigger_names: Dict[str, list] = {}
+bot.add_listener(on_trigger_message, 'on_message')
+scheduler = Scheduler(max_concurrency=int(tags.get('task_concurrency', 0)))
+load_shedder = LoadShedder(
+    threshold=float(tags.get('shed_lag', 0)),
+    priority=tags.get('shed_priority', 'low'),
+    interval=float(tags.get('shed_interval', 0.5))
+)
+slash_error_function = None
+
+def get_event_stats() -> Dict[str, Dict[str, int]]:
+    return {name: event_filter.stats() for name, event_filter in event_filters.items()}
+
+def get_command_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for name, definition in command_definitions.items():
+        if definition.cooldown is not None:
+            stats.setdefault(name, {})['cooldown'] = definition.cooldown.stats()
+        if definition.concurrency is not None:
+            stats.setdefault(name, {})['max_concurrency'] = definition.concurrency.stats()
+    return stats
+
+metrics.add_collector('outbox', bot.outbox.stats)
+metrics.add_collector('channel_cache', bot.channel_cache.stats)
+metrics.add_collector('components', bot.component_router.stats)
+metrics.add_collector('triggers', triggers.stats)
+metrics.add_collector('event_loop', load_shedder.stats)
+metrics.add_collector('profiler', profiler.stats)
+metrics.add_collector('variables', bot.variables.stats)
+metrics.add_collector('tasks', scheduler.stats, labeled=True)
+metrics.add_collector('events', get_event_stats, labeled=True)
+metrics.add_collector('scripts', get_script_stats, labeled=True)
+metrics.add_collector('commands', get_command_stats, labeled=True)
+
+def build_command(name: str, data: dict) -> tuple:
+    definition = create_command_definition(name, data)
+    func = create_command_function(definition)
+    slash_func = create_slash_command_function(definition)
+
+    return (definition,) + create_dynamic_command(name, instrument('command', name, func), instrument('slash_command', name, slash_func), definition.prefix, definition.slash)
+
+def add_command(name: str, built: tuple):
     print(f'Command found: {name}')
-    
-    func = create_command_function(value)
-    slash_func = create_slash_command_function(value)
-    
-    attr = value.get('@attributes', {})
-    prefix, slash = attr.get('prefix', True), attr.get('slash', True)
-    create_dynamic_command(name, func, slash_func, prefix, slash)
 
-for name, value in events.items():
+    definition, command, slash_command = built
+    if command is not None:
+        bot.add_command(command)
+    if slash_command is not None:
+        tree.add_command(slash_command)
+    command_definitions[name] = definition
+
+def remove_command(name: str):
+    definition = command_definitions.pop(name, None)
+    if definition is None:
+        return
+    if definition.prefix:
+        bot.remove_command(name)
+    if definition.slash:
+        tree.remove_command(name)
+
+def build_event(name: str, data: dict) -> Callable:
+    return instrument('event', name, create_event_function(data, name))
+
+def add_event(name: str, func: Callable):
+    global slash_error_function
     print(f'Event found: {name}')
-    
-    func = create_event_function(value, name)
-    
+
+    missing_intents = [intent for intent in get_event_intents(name) if not getattr(bot.intents, intent)]
+    if missing_intents:
+        print(f"Event {name} needs intents that are not enabled ({', '.join(missing_intents)}), restart the bot to enable them.")
+
+    event_filters[name] = func.event_filter
     if name == 'on_slash_command_error':
-        @tree.error
-        async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
-            await func(interaction, error)
+        slash_error_function = func
     else:
         bot.add_listener(func, name)
+    event_functions[name] = func
 
-views_list = {}
-for name, value in views.items():
+def remove_event(name: str):
+    global slash_error_function
+
+    func = event_functions.pop(name, None)
+    event_filters.pop(name, None)
+    if name == 'on_slash_command_error':
+        slash_error_function = None
+    elif func is not None:
+        bot.remove_listener(func, name)
+
+def build_task(name: str, data: dict) -> Optional[ScheduledTask]:
+    attr = data.get('@attributes', {})
+    if attr.get('enabled', False) != True:
+        return None
+    if attr.get('cluster') == 'single' and not primary_cluster:
+        return None
+
+    return create_scheduled_task(name, data)
+
+def add_task(name: str, task: Optional[ScheduledTask]):
+    if task is not None:
+        scheduler.add(task)
+
+def remove_task(name: str):
+    scheduler.remove(name)
+
+def build_trigger(name: str, data: dict) -> list:
+    # Repeated <trigger> elements share one name, each of them is its own rule.
+    items = as_list(data)
+    names = [name] if len(items) == 1 else [f'{name}:{index}' for index in range(len(items))]
+    return [create_trigger(trigger_name, item if isinstance(item, dict) else {}) for trigger_name, item in zip(names, items)]
+
+def add_trigger(name: str, built: list):
+    print(f'Trigger found: {name}')
+    if not bot.intents.message_content:
+        print(f'Trigger {name} needs the message_content intent, restart the bot to enable it.')
+
+    trigger_names[name] = [trigger.name for trigger in built]
+    for trigger in built:
+        triggers.add(trigger)
+
+def remove_trigger(name: str):
+    for trigger_name in trigger_names.pop(name, ()):
+        triggers.remove(trigger_name)
+
+def build_view(name: str, data: dict) -> tuple:
+    view, handlers = create_dynamic_view(name, data)
+    return view, {custom_id: instrument('component', custom_id, handler) for custom_id, handler in handlers.items()}
+
+def add_view(name: str, built: tuple):
     print(f'View found: {name}')
-    
-    view = create_dynamic_view(value)
-    views_list[name] = view
+    views_list[name], handlers = built
+    bot.component_router.add(name, handlers)
 
-modals_list = {}
-for name, value in modals.items():
+def remove_view(name: str):
+    views_list.pop(name, None)
+    bot.component_router.remove(name)
+
+def build_modal(name: str, data: dict) -> type:
+    return create_dynamic_modal(name, data)
+
+def add_modal(name: str, modal: type):
     print(f'Modal found: {name}')
-    
-    modal = create_dynamic_modal(value)
     modals_list[name] = modal
 
+def remove_modal(name: str):
+    modals_list.pop(name, None)
+
+section_handlers = {
+    'modals': (build_modal, add_modal, remove_modal),
+    'views': (build_view, add_view, remove_view),
+    'tasks': (build_task, add_task, remove_task),
+    'commands': (build_command, add_command, remove_command),
+    'events': (build_event, add_event, remove_event),
+    'triggers': (build_trigger, add_trigger, remove_trigger)
+}
+
+loaded_config: Dict[str, Any] = {}
+
+def get_slash_signatures() -> Dict[str, tuple]:
+    return {
+        name: tuple((parameter.name, parameter.annotation) for parameter in definition.parameters[1:])
+        for name, definition in command_definitions.items() if definition.slash
+    }
+
+def apply_config(new_config: Dict[str, Any]) -> bool:
+    # Everything that changed is built before anything is replaced, so a mistake in bot.xml
+    # leaves the running bot as it was.
+    changes = []
+    for section, (build, _, _) in section_handlers.items():
+        old = loaded_config.get(section, {})
+        new = new_config[section]
+
+        for name in old.keys() - new.keys():
+            changes.append((section, name, None, None))
+
+        for name, data in new.items():
+            if name not in old or old[name] != data:
+                changes.append((section, name, data, build(name, data)))
+
+    bot.component_router.check({name: built[1] if built else None for section, name, data, built in changes if section == 'views'})
+
+    if loaded_config and new_config['config'] != loaded_config['config']:
+        if new_config['config'].get('prefix') != loaded_config['config'].get('prefix'):
+            bot.command_prefix = new_config['config'].get('prefix', '!')
+        if {k: v for k, v in new_config['config'].items() if k != 'prefix'} != {k: v for k, v in loaded_config['config'].items() if k != 'prefix'}:
+            print('Changes in <config> (except <prefix>) are applied after a restart.')
+
+    if new_config['variables'] != loaded_config.get('variables'):
+        bot.variables.defaults = dict(new_config['variables'])
+
+    slash_signatures = get_slash_signatures()
+
+    for section, name, data, built in changes:
+        _, add, remove = section_handlers[section]
+        # loaded_config follows every single change, if one still fails the next reload starts from what is really loaded.
+        applied = loaded_config.setdefault(section, {})
+        if name in applied:
+            remove(name)
+            del applied[name]
+        if data is not None:
+            add(name, built)
+            applied[name] = data
+
+    loaded_config.update(new_config)
+    return get_slash_signatures() != slash_signatures
+
+async def reload_config():
+    try:
+        new_config = await asyncio.to_thread(load_config, CONFIG_FILE)
+    except (XMLParseError, OSError) as e:
+        print(f'Could not reload bot.xml: {e}')
+        return
+
+    try:
+        slash_changed = apply_config(new_config)
+    except Exception as e:
+        print(f'Could not apply changes from bot.xml: {e}')
+        return
+
+    print('Reloaded bot.xml')
+    if slash_changed and primary_cluster:
+        await command_syncer.sync()
+
+@tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if slash_error_function is None:
+        await app_commands.CommandTree.on_error(tree, interaction, error)
+    else:
+        await slash_error_function(interaction, error)
+
+try:
+    apply_config(bot_config)
+except ValueError as e:
+    print_error('Invalid bot.xml', e)
+
+config_watcher = FileWatcher(f'{CONFIG_FILE}.xml', reload_config, interval=float(tags.get('hot_reload_interval', 1))) if tags.get('hot_reload', False) else None
+
+command_syncer = CommandSyncer(tree, guild_ids=get_guild_ids(tags.get('sync_guilds')))
+started = False
+
+script_globals.update(globals())
+
 @bot.event
 async def on_ready():
-    for loop in enabled_loops:
-        await loop.start()
-    
-    slash_commands = await bot.tree.sync()
-    if DEBUG_MODE:
-        print(f'Synced {len(slash_commands)} slash commands')
+    global started
 
-TOKEN = get_token()
-bot.run(TOKEN)
+    # on_ready fires again after every reconnect, the startup work only has to happen once.
+    if started:
+        return
+    started = True
+
+    scheduler.start()
+    bot.variables.start()
+    load_shedder.start(always=metrics.enabled)
+    await metrics.start()
+
+    if config_watcher is not None:
+        config_watcher.start()
+    
+    # Slash commands are global to the application, one cluster syncing them is enough.
+    if primary_cluster:
+        slash_commands = await command_syncer.sync()
+        if DEBUG_MODE:
+            print(f'Synced {len(slash_commands)} slash commands ({command_syncer.skipped} up to date)')
+
+def main():
+    bot.run(get_token(config))
+
+# Importing base builds the bot without connecting, e.g. for benchmark.py.
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+# benchmark.py
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+import discord
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from fakegateway import APPLICATION_ID, BOT_ID, TIMESTAMP, FakeSession, get_bot_user
+
+USER_ID = BOT_ID + 1
+GUILD_ID = 2 << 22
+CHANNEL_ID = GUILD_ID + 1
+EVERYTHING = str((1 << 53) - 1)
+
+HANDLER_TYPES = ('prefix_command', 'slash_command', 'on_message', 'trigger', 'button_click', 'select_menu', 'modal_submit', 'task_tick')
+
+SAMPLE_ARGUMENTS = {
+    'int': '42', 'integer': '42', 'number': '42', 'numb': '42',
+    'list': 'a b c', 'array': 'a b c',
+    'dict': '{"a": 1}', 'dictionary': '{"a": 1}', 'json': '{"a": 1}'
+}
+OPTION_TYPES = {'int': 4, 'integer': 4, 'number': 4, 'numb': 4}
+
+Injector = Callable[[], Optional[Awaitable[None]]]
+
+def get_user() -> Dict[str, Any]:
+    return {'id': str(USER_ID), 'username': 'bench', 'discriminator': '0', 'avatar': None, 'global_name': None}
+
+def get_member() -> Dict[str, Any]:
+    return {'user': get_user(), 'roles': [], 'joined_at': TIMESTAMP, 'deaf': False, 'mute': False, 'flags': 0, 'permissions': EVERYTHING}
+
+def get_guild() -> Dict[str, Any]:
+    # The benchmark user owns the guild, so permission checks pass like they would for an admin.
+    return {
+        'id': str(GUILD_ID),
+        'name': 'Benchmark',
+        'owner_id': str(USER_ID),
+        'member_count': 2,
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'members': [get_member()],
+        'emojis': [],
+        'stickers': [],
+        'features': [],
+        'channels': [get_channel()],
+        'threads': [],
+        'voice_states': [],
+        'presences': []
+    }
+
+def get_channel() -> Dict[str, Any]:
+    return {'id': str(CHANNEL_ID), 'type': 0, 'guild_id': str(GUILD_ID), 'name': 'general', 'position': 0, 'permission_overwrites': []}
+
+def get_sample(argument: Dict[str, Any]) -> str:
+    return SAMPLE_ARGUMENTS.get(argument.get('type', 'str'), 'hello')
+
+def get_percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+class Benchmark:
+    def __init__(self, base, memory: bool = False):
+        self.base = base
+        self.memory = memory
+        self.bot = base.bot
+        self.state = base.bot._connection
+        self.session = FakeSession(GUILD_ID)
+        self.tasks = []
+        self.ids = itertools.count(1 << 40)
+        self.errors = 0
+
+    def next_id(self) -> str:
+        return str(next(self.ids))
+
+    def get_errors(self) -> int:
+        return self.errors + sum(task.errors for task in self.tasks)
+
+    async def setup(self):
+        await self.bot._async_setup_hook()
+        self.bot.http._HTTPClient__session = self.session
+        self.bot.http._global_over = asyncio.Event()
+        self.bot.http._global_over.set()
+
+        self.state.user = discord.ClientUser(state=self.state, data=get_bot_user())
+        self.state.application_id = APPLICATION_ID
+        self.state._add_guild(discord.Guild(data=get_guild(), state=self.state))
+
+        # Errors are counted instead of printed with a traceback for every event.
+        async def on_error(*args, **kwargs):
+            self.errors += 1
+        self.bot.on_error = on_error
+        self.bot.add_listener(on_error, 'on_command_error')
+        tree_error = self.base.tree.on_error
+
+        async def on_app_command_error(interaction, error):
+            self.errors += 1
+            if self.base.slash_error_function is not None:
+                await tree_error(interaction, error)
+        self.base.tree.on_error = on_app_command_error
+
+    def create_message(self, content: str) -> Dict[str, Any]:
+        return {
+            'id': self.next_id(),
+            'channel_id': str(CHANNEL_ID),
+            'guild_id': str(GUILD_ID),
+            'author': get_user(),
+            'member': get_member(),
+            'content': content,
+            'type': 0,
+            'timestamp': TIMESTAMP,
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False
+        }
+
+    def create_interaction(self, interaction_type: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': self.next_id(),
+            'application_id': str(APPLICATION_ID),
+            'type': interaction_type,
+            'token': 'benchmark',
+            'version': 1,
+            'guild_id': str(GUILD_ID),
+            'channel_id': str(CHANNEL_ID),
+            'channel': get_channel(),
+            'member': get_member(),
+            'app_permissions': EVERYTHING,
+            'locale': 'en-US',
+            'guild_locale': 'en-US',
+            'entitlements': [],
+            'authorizing_integration_owners': {},
+            'attachment_size_limit': 10 * 1024 * 1024,
+            'context': 0,
+            'data': data
+        }
+
+    def get_prefix_commands(self) -> List[Injector]:
+        prefix = self.base.config.get('prefix', '!')
+        injectors = []
+        for name, definition in self.base.command_definitions.items():
+            if not definition.prefix:
+                continue
+            arguments = self.base.get_argument_list(self.base.bot_config['commands'][name])
+            content = ' '.join([f'{prefix}{name}'] + [get_sample(argument) for argument in arguments])
+            injectors.append(lambda content=content: self.state.parse_message_create(self.create_message(content)))
+        return injectors
+
+    def get_slash_commands(self) -> List[Injector]:
+        injectors = []
+        for name, definition in self.base.command_definitions.items():
+            if not definition.slash:
+                continue
+            arguments = self.base.get_argument_list(self.base.bot_config['commands'][name])
+            options = [
+                {'name': argument['name'], 'type': OPTION_TYPES.get(argument.get('type', 'str'), 3), 'value': int(get_sample(argument)) if OPTION_TYPES.get(argument.get('type', 'str')) else get_sample(argument)}
+                for argument in arguments
+            ]
+            data = {'id': self.next_id(), 'name': name, 'type': 1, 'options': options}
+            injectors.append(lambda data=data: self.state.parse_interaction_create(self.create_interaction(2, data)))
+        return injectors
+
+    def get_messages(self) -> List[Injector]:
+        if 'on_message' not in self.base.event_functions:
+            return []
+        return [lambda: self.state.parse_message_create(self.create_message('just a normal message'))]
+
+    def get_triggers(self) -> List[Injector]:
+        injectors = []
+        for trigger in self.base.triggers.triggers.values():
+            content = f'message with {trigger.pattern} in it' if trigger.type == 'keyword' else None
+            if content is not None:
+                injectors.append(lambda content=content: self.state.parse_message_create(self.create_message(content)))
+        return injectors
+
+    def get_components(self, component_type: int) -> List[Injector]:
+        injectors = []
+        for view_class in self.base.views_list.values():
+            for item in view_class().children:
+                if component_type == 2 and isinstance(item, discord.ui.Button) and item.url is None:
+                    data = {'custom_id': item.custom_id, 'component_type': 2}
+                elif component_type == 3 and isinstance(item, discord.ui.Select) and item.options:
+                    data = {'custom_id': item.custom_id, 'component_type': 3, 'values': [item.options[0].value]}
+                else:
+                    continue
+                injectors.append(lambda data=data: self.state.parse_interaction_create(self.create_interaction(3, data)))
+        return injectors
+
+    def get_modals(self) -> List[Injector]:
+        injectors = []
+        for modal_class in self.base.modals_list.values():
+            def inject(modal_class=modal_class):
+                # A modal only accepts one submit, every event sends a new one.
+                modal = modal_class()
+                self.state.store_view(modal)
+                components = [
+                    {'type': 1, 'components': [{'type': 4, 'custom_id': item.custom_id, 'value': 'benchmark'}]}
+                    for item in modal.children if isinstance(item, discord.ui.TextInput)
+                ]
+                self.state.parse_interaction_create(self.create_interaction(5, {'custom_id': modal.custom_id, 'components': components}))
+            injectors.append(inject)
+        return injectors
+
+    def get_tasks(self) -> List[Injector]:
+        scheduler = self.base.scheduler
+        self.tasks = [self.base.create_scheduled_task(name, data) for name, data in self.base.bot_config['tasks'].items()]
+        return [lambda task=task: scheduler.call(task) for task in self.tasks]
+
+    def get_injectors(self) -> Dict[str, List[Injector]]:
+        return {
+            'prefix_command': self.get_prefix_commands(),
+            'slash_command': self.get_slash_commands(),
+            'on_message': self.get_messages(),
+            'trigger': self.get_triggers(),
+            'button_click': self.get_components(2),
+            'select_menu': self.get_components(3),
+            'modal_submit': self.get_modals(),
+            'task_tick': self.get_tasks()
+        }
+
+    async def run_event(self, inject: Injector) -> float:
+        # An event is done when every task it started (listeners, command callbacks, queued sends) finished.
+        current = asyncio.current_task()
+        before = asyncio.all_tasks()
+        start = time.perf_counter()
+
+        result = inject()
+        if result is not None:
+            await result
+        while True:
+            pending = asyncio.all_tasks() - before
+            pending.discard(current)
+            if not pending:
+                break
+            await asyncio.gather(*pending, return_exceptions=True)
+            before |= pending
+
+        return time.perf_counter() - start
+
+    async def measure(self, injectors: List[Injector], iterations: int, warmup: int) -> Dict[str, Any]:
+        events = itertools.cycle(injectors)
+        for _ in range(warmup):
+            await self.run_event(next(events))
+
+        requests = len(self.session.requests)
+        errors = self.get_errors()
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            latencies.append(await self.run_event(next(events)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+
+        result = {
+            'handlers': len(injectors),
+            'events': iterations,
+            'throughput': iterations / elapsed if elapsed else 0.0,
+            'p50': get_percentile(latencies, 50),
+            'p99': get_percentile(latencies, 99),
+            'max': latencies[-1],
+            'requests': (len(self.session.requests) - requests) / iterations,
+            'errors': self.get_errors() - errors
+        }
+        if self.memory:
+            result.update(await self.measure_memory(events, iterations))
+        return result
+
+    async def measure_memory(self, events: Iterator[Injector], iterations: int) -> Dict[str, float]:
+        # tracemalloc slows down every allocation, so memory is measured in its own pass after the timings.
+        gc.collect()
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        peaks = 0
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await self.run_event(next(events))
+            peaks += tracemalloc.get_traced_memory()[1] - before
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+
+        return {
+            'memory_peak': peaks / iterations,
+            'memory_retained': retained / iterations
+        }
+
+    async def run(self, iterations: int, warmup: int, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        await self.setup()
+        results = {}
+        for handler_type, injectors in self.get_injectors().items():
+            if not injectors or (only and handler_type not in only):
+                continue
+            # Actions like <log> print on every event, which would only measure the terminal. Errors are counted instead.
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                results[handler_type] = await self.measure(injectors, iterations, warmup)
+        return results
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    memory = any('memory_peak' in result for result in results.values())
+    print(
+        f"{'Handler':<16}{'Handlers':>9}{'Events/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'Max ms':>9}{'Req/event':>11}{'Errors':>8}"
+        + (f"{'Peak KB':>9}{'Kept B':>8}" if memory else '')
+    )
+    for handler_type, result in results.items():
+        print(
+            f"{handler_type:<16}{result['handlers']:>9}{result['throughput']:>11.0f}"
+            f"{result['p50'] * 1000:>9.3f}{result['p99'] * 1000:>9.3f}{result['max'] * 1000:>9.3f}"
+            f"{result['requests']:>11.2f}{result['errors']:>8}"
+            + (f"{result['memory_peak'] / 1024:>9.1f}{result['memory_retained']:>8.0f}" if memory else '')
+        )
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], max_regression: float) -> List[str]:
+    regressions = []
+    for handler_type, result in results.items():
+        old = baseline.get(handler_type)
+        if old and old['p50'] and result['p50'] > old['p50'] * (1 + max_regression):
+            regressions.append(f"{handler_type}: p50 {old['p50'] * 1000:.3f} ms -> {result['p50'] * 1000:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure XMLCord handlers offline, against an in-memory stand-in for Discord.')
+    parser.add_argument('config', nargs='?', default='bot', help='bot XML file to load (default: bot.xml)')
+    parser.add_argument('--iterations', type=int, default=1000, help='events measured per handler type (default: 1000)')
+    parser.add_argument('--warmup', type=int, default=100, help='events run before measuring (default: 100)')
+    parser.add_argument('--only', help='comma-separated handler types to run')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare p50 latencies with')
+    parser.add_argument('--memory', action='store_true', help='also measure the memory used per event with tracemalloc')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='allowed p50 increase over the baseline (default: 0.25 = 25%%)')
+    args = parser.parse_args()
+
+    config = args.config[:-4] if args.config.endswith('.xml') else args.config
+    os.environ['XMLCORD_CONFIG'] = config
+    only = args.only.replace(' ', '').split(',') if args.only else None
+    for handler_type in only or ():
+        if handler_type not in HANDLER_TYPES:
+            parser.error(f"unknown handler type '{handler_type}', use one of: {', '.join(HANDLER_TYPES)}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import base
+
+    results = asyncio.run(Benchmark(base, memory=args.memory).run(args.iterations, args.warmup, only))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print('Regressions:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
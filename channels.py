@@ -0,0 +1,94 @@
+# channels.py
+
+import time
+import discord
+from collections import OrderedDict
+from typing import Dict
+
+class ChannelCache:
+    def __init__(self, bot, max_size: int = 256, ttl: float = 300.0):
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+        self.channels: OrderedDict = OrderedDict()
+        self.partials: Dict[int, discord.PartialMessageable] = {}
+
+        self.gateway_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.partial_hits = 0
+        self.invalidations = 0
+
+    def register(self):
+        for event in ('on_guild_channel_delete', 'on_private_channel_delete', 'on_thread_delete'):
+            self.bot.add_listener(self.on_channel_delete, event)
+        for event in ('on_guild_channel_update', 'on_private_channel_update', 'on_thread_update'):
+            self.bot.add_listener(self.on_channel_update, event)
+
+    async def on_channel_delete(self, channel):
+        self.invalidate(channel.id)
+
+    async def on_channel_update(self, before, after):
+        self.invalidate(after.id)
+
+    def invalidate(self, channel_id: int):
+        if self.channels.pop(channel_id, None) is not None:
+            self.invalidations += 1
+        self.partials.pop(channel_id, None)
+
+    def clear(self):
+        self.channels.clear()
+        self.partials.clear()
+
+    def get_cached(self, channel_id: int):
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            self.gateway_hits += 1
+            return channel
+
+        entry = self.channels.get(channel_id)
+        if entry is not None:
+            channel, expires = entry
+            if expires > time.monotonic():
+                self.channels.move_to_end(channel_id)
+                self.hits += 1
+                return channel
+            del self.channels[channel_id]
+
+        return None
+
+    def get_partial(self, channel_id: int) -> discord.PartialMessageable:
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            self.gateway_hits += 1
+            return channel
+
+        partial = self.partials.get(channel_id)
+        if partial is None:
+            partial = self.partials[channel_id] = self.bot.get_partial_messageable(channel_id)
+        else:
+            self.partial_hits += 1
+        return partial
+
+    async def get(self, channel_id: int):
+        channel = self.get_cached(channel_id)
+        if channel is not None:
+            return channel
+
+        self.misses += 1
+        channel = await self.bot.fetch_channel(channel_id)
+        self.channels[channel_id] = (channel, time.monotonic() + self.ttl)
+        if len(self.channels) > self.max_size:
+            self.channels.popitem(last=False)
+        return channel
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self.channels),
+            'partials': len(self.partials),
+            'gateway_hits': self.gateway_hits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'partial_hits': self.partial_hits,
+            'invalidations': self.invalidations
+        }
@@ -0,0 +1,162 @@
+# cluster.py
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import discord
+from typing import List, Optional, Tuple
+from xml.etree.ElementTree import ParseError as XMLParseError
+from loader import compile_config, load_config
+from shards import split_shards, use_gateway
+from utils import print_error, get_token
+
+RESTART_DELAY = 5.0
+STOP_TIMEOUT = 10.0
+BASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'base.py')
+
+def format_shards(shard_ids: Tuple[int, ...]) -> str:
+    if len(shard_ids) == 1:
+        return str(shard_ids[0])
+    return f'{shard_ids[0]}-{shard_ids[-1]}'
+
+async def fetch_shard_count(token: str) -> int:
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shard_count
+
+class Worker:
+    def __init__(self, cluster_id: int, cluster_count: int, shard_ids: Tuple[int, ...], shard_count: int, gateway: Optional[str] = None, config: str = 'bot'):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+        self.env = dict(
+            os.environ,
+            XMLCORD_CLUSTER_ID=str(cluster_id),
+            XMLCORD_CLUSTER_COUNT=str(cluster_count),
+            XMLCORD_SHARD_IDS=','.join(map(str, shard_ids)),
+            XMLCORD_SHARD_COUNT=str(shard_count),
+            XMLCORD_CONFIG=config
+        )
+        if gateway:
+            self.env['XMLCORD_GATEWAY'] = gateway
+
+    async def run(self, stopping: asyncio.Event):
+        while not stopping.is_set():
+            print(f'Starting cluster {self.cluster_id} (shards {format_shards(self.shard_ids)})')
+            self.process = await asyncio.create_subprocess_exec(sys.executable, BASE_FILE, env=self.env)
+            code = await self.process.wait()
+
+            if stopping.is_set() or code == 0:
+                break
+
+            self.restarts += 1
+            print(f'Cluster {self.cluster_id} exited with code {code}, restarting in {RESTART_DELAY:g}s')
+            try:
+                await asyncio.wait_for(stopping.wait(), RESTART_DELAY)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+def get_config_name(value: str) -> str:
+    return value[:-4] if value.endswith('.xml') else value
+
+async def run_cluster(args: argparse.Namespace):
+    config = get_config_name(args.config)
+    try:
+        cache_path = compile_config(config)
+        bot_config = load_config(config)
+    except XMLParseError as e:
+        print_error('Failed to parse XML', e)
+    except FileNotFoundError:
+        print_error('File not found', f'The file \'{config}.xml\' was not found.')
+    except OSError as e:
+        print_error('OS Error', e)
+    print(f'Compiled {config}.xml to {cache_path}')
+
+    tags = bot_config['config']['tags']
+    fake_gateway = None
+    gateway = args.gateway or os.getenv('XMLCORD_GATEWAY')
+
+    shard_count = args.shards or tags.get('shard_count')
+    if args.fake_gateway:
+        from fakegateway import FakeGateway
+        fake_gateway = FakeGateway(shard_count=int(shard_count or args.clusters or 1), port=args.port)
+        gateway = fake_gateway.url
+        shard_count = fake_gateway.shard_count
+    elif shard_count is None and not args.dry_run:
+        if gateway:
+            use_gateway(gateway)
+        shard_count = await fetch_shard_count(get_token(bot_config['config']))
+        print(f'Discord recommends {shard_count} shards')
+
+    shard_count = int(shard_count or 1)
+    clusters = int(args.clusters or tags.get('clusters') or os.cpu_count() or 1)
+    ranges = split_shards(shard_count, clusters)
+
+    for cluster_id, shard_ids in enumerate(ranges):
+        print(f'Cluster {cluster_id}: shards {format_shards(shard_ids)} of {shard_count}')
+    if args.dry_run:
+        return
+
+    if fake_gateway is not None:
+        await fake_gateway.start()
+        print(f'Fake gateway running on {fake_gateway.url}')
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    workers: List[Worker] = [
+        Worker(cluster_id, len(ranges), shard_ids, shard_count, gateway, config)
+        for cluster_id, shard_ids in enumerate(ranges)
+    ]
+    runs = [asyncio.create_task(worker.run(stopping)) for worker in workers]
+
+    try:
+        done = asyncio.gather(*runs)
+        await asyncio.wait([done, asyncio.create_task(stopping.wait())], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopping.set()
+        print('Stopping clusters')
+        await asyncio.gather(*(worker.stop() for worker in workers))
+        await asyncio.gather(*runs, return_exceptions=True)
+        if fake_gateway is not None:
+            await fake_gateway.stop()
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Run bot.xml as several processes, each connecting a range of shards.')
+    parser.add_argument('--config', default=os.getenv('XMLCORD_CONFIG', 'bot'), help='bot XML file, passed to every worker (default: XMLCORD_CONFIG or bot.xml)')
+    parser.add_argument('--clusters', type=int, help='number of worker processes (default: clusters tag or CPU count)')
+    parser.add_argument('--shards', type=int, help='total shard count (default: shard_count tag or the count recommended by Discord)')
+    parser.add_argument('--gateway', help='API and gateway URL to connect to instead of Discord')
+    parser.add_argument('--fake-gateway', action='store_true', help='start a local fake gateway and connect the workers to it')
+    parser.add_argument('--port', type=int, default=8080, help='port of the fake gateway')
+    parser.add_argument('--dry-run', action='store_true', help='only print how the shards are split')
+    return parser
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(run_cluster(get_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
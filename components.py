@@ -0,0 +1,74 @@
+# components.py
+
+import discord
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+ComponentHandler = Callable[[discord.Interaction], Awaitable[None]]
+
+CUSTOM_ID_PREFIX = 'xmlcord'
+MAX_CUSTOM_ID_LENGTH = 100
+
+def get_custom_id(view: str, kind: str, index: int) -> str:
+    custom_id = f'{CUSTOM_ID_PREFIX}:{view}:{kind}:{index}'
+    if len(custom_id) > MAX_CUSTOM_ID_LENGTH:
+        raise ValueError(f"custom_id '{custom_id}' is longer than {MAX_CUSTOM_ID_LENGTH} characters, use a shorter view name or set custom_id")
+    return custom_id
+
+def as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+class ComponentRouter:
+    def __init__(self, bot):
+        self.bot = bot
+        self.handlers: Dict[str, ComponentHandler] = {}
+        self.owners: Dict[str, str] = {}
+
+        self.dispatched = 0
+        self.unknown = 0
+
+    def register(self):
+        self.bot.add_listener(self.on_interaction, 'on_interaction')
+
+    def add(self, owner: str, handlers: Dict[str, ComponentHandler]):
+        for custom_id in handlers:
+            if self.owners.get(custom_id, owner) != owner:
+                raise ValueError(f"custom_id '{custom_id}' of view '{owner}' is already used by view '{self.owners[custom_id]}'")
+
+        for custom_id, handler in handlers.items():
+            self.handlers[custom_id] = handler
+            self.owners[custom_id] = owner
+
+    def check(self, changes: Dict[str, Optional[Dict[str, ComponentHandler]]]):
+        # Checks the views of a reload before any of them is replaced, views that change can swap IDs.
+        owners = {custom_id: owner for custom_id, owner in self.owners.items() if owner not in changes}
+        for owner, handlers in changes.items():
+            for custom_id in handlers or ():
+                if owners.setdefault(custom_id, owner) != owner:
+                    raise ValueError(f"custom_id '{custom_id}' of view '{owner}' is already used by view '{owners[custom_id]}'")
+
+    def remove(self, owner: str):
+        for custom_id in [custom_id for custom_id, name in self.owners.items() if name == owner]:
+            del self.handlers[custom_id]
+            del self.owners[custom_id]
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+
+        # Handlers are looked up by custom_id alone, so components on messages sent before a restart keep working.
+        handler = self.handlers.get(interaction.data.get('custom_id'))
+        if handler is None:
+            self.unknown += 1
+            return
+
+        self.dispatched += 1
+        await handler(interaction)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'handlers': len(self.handlers),
+            'dispatched': self.dispatched,
+            'unknown': self.unknown
+        }
@@ -0,0 +1,338 @@
+# fakegateway.py
+
+import asyncio
+import itertools
+import json
+import re
+import sys
+from aiohttp import web, WSMsgType
+from typing import Any, Dict, List, Optional
+
+HELLO = 10
+HEARTBEAT = 1
+HEARTBEAT_ACK = 11
+IDENTIFY = 2
+RESUME = 6
+DISPATCH = 0
+
+BOT_ID = 1 << 22
+APPLICATION_ID = BOT_ID
+TIMESTAMP = '2024-01-01T00:00:00+00:00'
+
+def json_response(data: Any) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly 'application/json', without a charset.
+    return web.Response(body=json.dumps(data).encode(), content_type='application/json')
+
+def get_bot_user() -> Dict[str, Any]:
+    return {'id': str(BOT_ID), 'username': 'XMLCord', 'discriminator': '0', 'avatar': None, 'bot': True}
+
+def create_message(message_id: str, channel_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': message_id,
+        'channel_id': channel_id,
+        'type': 0,
+        'author': get_bot_user(),
+        'content': payload.get('content') or '',
+        'embeds': payload.get('embeds') or [],
+        'components': payload.get('components') or [],
+        'attachments': [],
+        'mentions': [],
+        'mention_roles': [],
+        'mention_everyone': False,
+        'pinned': False,
+        'tts': False,
+        'timestamp': TIMESTAMP,
+        'edited_timestamp': None
+    }
+
+def create_callback(interaction_id: str, message_id: str, channel_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # discord.py asks for the callback response (with_response=1) and reads the message that was sent from it.
+    response_type = payload.get('type', 4)
+    resource: Dict[str, Any] = {'type': response_type}
+    if response_type in (4, 7):
+        resource['message'] = create_message(message_id, channel_id, payload.get('data') or {})
+
+    return {
+        'interaction': {
+            'id': interaction_id,
+            'type': 2,
+            'response_message_id': message_id if 'message' in resource else None,
+            'response_message_loading': response_type == 5,
+            'response_message_ephemeral': bool((payload.get('data') or {}).get('flags', 0) & 64)
+        },
+        'resource': resource
+    }
+
+async def read_request(request: web.Request) -> Dict[str, Any]:
+    if request.content_type == 'application/json':
+        return await request.json()
+    return json.loads((await request.post()).get('payload_json', '{}'))
+
+def read_payload(body: Any) -> Dict[str, Any]:
+    if isinstance(body, (str, bytes)):
+        return json.loads(body or '{}')
+    return {}
+
+class FakeResponse:
+    def __init__(self, status: int, data: Any = None):
+        self.status = status
+        self.reason = 'OK' if status < 300 else 'Not Found'
+        self.body = json.dumps(data) if data is not None else ''
+        self.headers = {'content-type': 'application/json'} if data is not None else {}
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self.body
+
+    async def __aenter__(self) -> 'FakeResponse':
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+class FakeSession:
+    # Stands in for the aiohttp session of discord.py's HTTP client and interaction webhooks, so actions
+    # go through discord.py as usual but every request is answered from memory and recorded.
+    def __init__(self, guild_id: int = 1 << 22):
+        self.guild_id = str(guild_id)
+        self.ids = itertools.count(1000)
+        self.requests: List[tuple] = []
+        self.closed = False
+        self.routes = [
+            ('POST', re.compile(r'/channels/(\d+)/messages$'), self.post_message),
+            ('GET', re.compile(r'/channels/(\d+)$'), self.get_channel),
+            ('POST', re.compile(r'/interactions/(\d+)/[^/]+/callback$'), self.post_callback),
+            ('POST', re.compile(r'/webhooks/(\d+)/[^/]+$'), self.post_message),
+            ('PATCH', re.compile(r'/webhooks/(\d+)/[^/]+/messages/[^/]+$'), self.post_message),
+            ('PATCH', re.compile(r'/guilds/\d+/members/(\d+)$'), self.patch_member),
+            ('PUT', re.compile(r'/guilds/\d+/members/\d+/roles/(\d+)$'), self.edit_role),
+            ('DELETE', re.compile(r'/guilds/\d+/members/\d+/roles/(\d+)$'), self.edit_role)
+        ]
+
+    def next_id(self) -> str:
+        return str(next(self.ids) << 22)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> FakeResponse:
+        path = url.split('/api/v10', 1)[-1].split('?', 1)[0]
+        self.requests.append((method, path))
+        payload = read_payload(kwargs.get('data'))
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.search(path) if route_method == method else None
+            if match is not None:
+                data = handler(match.group(1), payload)
+                return FakeResponse(200 if data is not None else 204, data)
+        return FakeResponse(204)
+
+    def post_message(self, channel_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return create_message(self.next_id(), channel_id, payload)
+
+    def get_channel(self, channel_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': channel_id, 'type': 0, 'guild_id': self.guild_id, 'name': 'channel', 'position': 0, 'permission_overwrites': []}
+
+    def post_callback(self, interaction_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return create_callback(interaction_id, self.next_id(), '0', payload)
+
+    def patch_member(self, user_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'user': {'id': user_id, 'username': 'member', 'discriminator': '0', 'avatar': None},
+            'roles': payload.get('roles') or [],
+            'joined_at': TIMESTAMP,
+            'deaf': False,
+            'mute': False,
+            'flags': 0
+        }
+
+    def edit_role(self, role_id: str, payload: Dict[str, Any]) -> None:
+        return None
+
+class FakeGateway:
+    def __init__(self, shard_count: int = 1, guilds: int = 10, host: str = '127.0.0.1', port: int = 8080, heartbeat_interval: int = 41250):
+        self.shard_count = shard_count
+        self.guild_count = guilds
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+
+        self.ids = itertools.count(1000)
+        self.sessions: Dict[int, web.WebSocketResponse] = {}
+        self.sequences: Dict[int, int] = {}
+        self.identified: Dict[int, int] = {}
+        self.commands: Dict[str, list] = {}
+        self.messages: List[Dict[str, Any]] = []
+        self.runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get('/gateway', self.gateway),
+            web.get('/api/v10/gateway', self.get_gateway),
+            web.get('/api/v10/gateway/bot', self.get_bot_gateway),
+            web.get('/api/v10/users/@me', self.get_user),
+            web.get('/api/v10/oauth2/applications/@me', self.get_application),
+            web.put('/api/v10/applications/{application_id}/commands', self.put_commands),
+            web.put('/api/v10/applications/{application_id}/guilds/{guild_id}/commands', self.put_commands),
+            web.post('/api/v10/channels/{channel_id}/messages', self.post_message),
+            web.post('/api/v10/interactions/{interaction_id}/{token}/callback', self.post_callback),
+            web.post('/api/v10/webhooks/{application_id}/{token}', self.post_followup),
+            web.patch('/api/v10/webhooks/{application_id}/{token}/messages/{message_id}', self.post_followup)
+        ])
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self):
+        for ws in list(self.sessions.values()):
+            await ws.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def next_id(self) -> str:
+        return str(next(self.ids) << 22)
+
+    def get_guild_ids(self, shard_id: int) -> List[int]:
+        # Same formula Discord uses to pick the shard of a guild: (guild_id >> 22) % shard_count.
+        return [index << 22 for index in range(1, self.guild_count + 1) if index % self.shard_count == shard_id]
+
+    def get_guild(self, guild_id: int) -> Dict[str, Any]:
+        return {
+            'id': str(guild_id),
+            'name': f'Guild {guild_id >> 22}',
+            'owner_id': str(BOT_ID),
+            'member_count': 1,
+            'roles': [],
+            'members': [],
+            'emojis': [],
+            'stickers': [],
+            'features': [],
+            'channels': [{'id': str(guild_id + 1), 'type': 0, 'name': 'general', 'position': 0, 'permission_overwrites': []}],
+            'threads': [],
+            'voice_states': [],
+            'presences': []
+        }
+
+    async def dispatch(self, event: str, data: Dict[str, Any], shard_id: int = 0):
+        ws = self.sessions.get(shard_id)
+        if ws is None:
+            return
+        self.sequences[shard_id] = self.sequences.get(shard_id, 0) + 1
+        await ws.send_str(json.dumps({'op': DISPATCH, 't': event, 's': self.sequences[shard_id], 'd': data}))
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({'op': HELLO, 'd': {'heartbeat_interval': self.heartbeat_interval}}))
+
+        shard_id = None
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(msg.data)
+            op = payload.get('op')
+
+            if op == HEARTBEAT:
+                await ws.send_str(json.dumps({'op': HEARTBEAT_ACK}))
+            elif op == IDENTIFY:
+                shard_id, shard_count = payload['d'].get('shard', [0, 1])
+                if shard_count != self.shard_count:
+                    await ws.close(code=4011)
+                    break
+                self.sessions[shard_id] = ws
+                self.identified[shard_id] = self.identified.get(shard_id, 0) + 1
+                await self.ready(shard_id)
+            elif op == RESUME and shard_id is not None:
+                await self.dispatch('RESUMED', {}, shard_id)
+
+        if shard_id is not None and self.sessions.get(shard_id) is ws:
+            del self.sessions[shard_id]
+        return ws
+
+    async def ready(self, shard_id: int):
+        guild_ids = self.get_guild_ids(shard_id)
+        await self.dispatch('READY', {
+            'v': 10,
+            'user': get_bot_user(),
+            'guilds': [{'id': str(guild_id), 'unavailable': True} for guild_id in guild_ids],
+            'session_id': f'session-{shard_id}',
+            'resume_gateway_url': self.url.replace('http', 'ws', 1) + '/gateway',
+            'shard': [shard_id, self.shard_count],
+            'application': {'id': str(APPLICATION_ID), 'flags': 0}
+        }, shard_id)
+
+        for guild_id in guild_ids:
+            await self.dispatch('GUILD_CREATE', self.get_guild(guild_id), shard_id)
+
+    async def get_gateway(self, request: web.Request) -> web.Response:
+        return json_response({'url': self.url.replace('http', 'ws', 1) + '/gateway'})
+
+    async def get_bot_gateway(self, request: web.Request) -> web.Response:
+        return json_response({
+            'url': self.url.replace('http', 'ws', 1) + '/gateway',
+            'shards': self.shard_count,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1}
+        })
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return json_response(get_bot_user())
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return json_response({
+            'id': str(APPLICATION_ID),
+            'name': 'XMLCord',
+            'icon': None,
+            'description': '',
+            'bot_public': True,
+            'bot_require_code_grant': False,
+            'verify_key': '',
+            'flags': 0,
+            'owner': {'id': str(BOT_ID + 1), 'username': 'owner', 'discriminator': '0', 'avatar': None}
+        })
+
+    async def put_commands(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        scope = request.match_info.get('guild_id', 'global')
+        self.commands[scope] = payload
+        return json_response([
+            dict(command, id=self.next_id(), application_id=str(APPLICATION_ID), version='1')
+            for command in payload
+        ])
+
+    async def post_message(self, request: web.Request) -> web.Response:
+        message = create_message(self.next_id(), request.match_info['channel_id'], await read_request(request))
+        self.messages.append(message)
+        return json_response(message)
+
+    async def post_callback(self, request: web.Request) -> web.Response:
+        # An empty body can't be read by discord.py, it expects the callback response with the sent message.
+        return json_response(create_callback(request.match_info['interaction_id'], self.next_id(), '0', await read_request(request)))
+
+    async def post_followup(self, request: web.Request) -> web.Response:
+        message = create_message(self.next_id(), '0', await read_request(request))
+        self.messages.append(message)
+        return json_response(message)
+
+async def serve(shard_count: int, guilds: int, port: int):
+    gateway = FakeGateway(shard_count=shard_count, guilds=guilds, port=port)
+    await gateway.start()
+    print(f'Fake gateway running on {gateway.url} ({shard_count} shards, {guilds} guilds)')
+    print(f'Start the bot with XMLCORD_GATEWAY={gateway.url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await gateway.stop()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    try:
+        asyncio.run(serve(
+            shard_count=int(args[0]) if len(args) > 0 else 1,
+            guilds=int(args[1]) if len(args) > 1 else 10,
+            port=int(args[2]) if len(args) > 2 else 8080
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,121 @@
+# filters.py
+
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+Check = Callable[[Any], bool]
+
+# Events whose message is not the first argument.
+SUBJECT_ARGUMENTS = {
+    'on_message_edit': 1
+}
+
+def get_ids(value: Any) -> frozenset:
+    return frozenset(int(item) for item in str(value).replace(' ', '').split(',') if item)
+
+def get_message(subject: Any) -> Any:
+    # Reactions point to their message, everything else is checked as it is.
+    return getattr(subject, 'message', subject) if hasattr(subject, 'emoji') else subject
+
+def get_author(subject: Any) -> Any:
+    author = getattr(subject, 'author', None)
+    if author is not None:
+        return author
+    if hasattr(subject, 'roles') or hasattr(subject, 'bot'):
+        return subject
+    return getattr(subject, 'user', None)
+
+def get_guild_id(message: Any) -> Optional[int]:
+    guild = getattr(message, 'guild', None)
+    if guild is None:
+        return getattr(message, 'guild_id', None)
+    return guild.id
+
+def get_channel_id(message: Any) -> Optional[int]:
+    channel = getattr(message, 'channel', None)
+    if channel is None:
+        return getattr(message, 'channel_id', None)
+    return channel.id
+
+def combine_checks(checks: List[Check]) -> Optional[Check]:
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    checks = tuple(checks)
+
+    def predicate(message: Any) -> bool:
+        for check in checks:
+            if not check(message):
+                return False
+        return True
+    return predicate
+
+class EventFilter:
+    def __init__(self, event: str, attributes: Dict[str, Any], bot=None, ignore_self: bool = False):
+        self.event = event
+        self.index = SUBJECT_ARGUMENTS.get(event, 0)
+        self.bot = bot
+        self.ignore_self = ignore_self
+        self.predicate = combine_checks(self.compile(attributes))
+
+        self.accepted = 0
+        self.filtered = 0
+
+    def compile(self, attributes: Dict[str, Any]) -> List[Check]:
+        checks: List[Check] = []
+
+        if 'guilds' in attributes:
+            guilds = get_ids(attributes['guilds'])
+            checks.append(lambda message: get_guild_id(message) in guilds)
+
+        if 'channels' in attributes:
+            channels = get_ids(attributes['channels'])
+            checks.append(lambda message: get_channel_id(message) in channels)
+
+        if attributes.get('ignore_bots', False) == True:
+            checks.append(lambda message: not getattr(get_author(message), 'bot', False))
+
+        if 'roles' in attributes:
+            roles = get_ids(attributes['roles'])
+            checks.append(lambda message: any(role.id in roles for role in getattr(get_author(message), 'roles', ())))
+
+        if 'attachments' in attributes:
+            wanted = attributes['attachments'] == True
+            checks.append(lambda message: bool(getattr(message, 'attachments', None)) == wanted)
+
+        if 'startswith' in attributes:
+            prefix = str(attributes['startswith'])
+            checks.append(lambda message: (getattr(message, 'content', None) or '').startswith(prefix))
+
+        if 'regex' in attributes:
+            try:
+                pattern = re.compile(str(attributes['regex']))
+            except re.error as e:
+                raise ValueError(f"Invalid regex in filter of {self.event}: {e}") from None
+            search = pattern.search
+            checks.append(lambda message: search(getattr(message, 'content', None) or '') is not None)
+
+        return checks
+
+    def is_self(self, message: Any) -> bool:
+        user = self.bot.user if self.bot is not None else None
+        author = getattr(message, 'author', None)
+        return user is not None and author is not None and author.id == user.id
+
+    def check(self, args: tuple) -> bool:
+        if len(args) <= self.index:
+            self.accepted += 1
+            return True
+
+        message = get_message(args[self.index])
+        if (self.ignore_self and self.is_self(message)) or (self.predicate is not None and not self.predicate(message)):
+            self.filtered += 1
+            return False
+
+        self.accepted += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {'accepted': self.accepted, 'filtered': self.filtered}
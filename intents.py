@@ -0,0 +1,185 @@
+# intents.py
+
+import discord
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MESSAGES = ('guild_messages', 'dm_messages')
+REACTIONS = ('guild_reactions', 'dm_reactions')
+MESSAGE_CONTENT = MESSAGES + ('message_content',)
+
+EVENT_INTENTS = {
+    'on_message': MESSAGE_CONTENT,
+    'on_message_edit': MESSAGE_CONTENT,
+    'on_message_delete': MESSAGES,
+    'on_bulk_message_delete': ('guild_messages',),
+    'on_raw_message_edit': MESSAGES,
+    'on_raw_message_delete': MESSAGES,
+    'on_raw_bulk_message_delete': ('guild_messages',),
+    'on_reaction_add': REACTIONS,
+    'on_reaction_remove': REACTIONS,
+    'on_reaction_clear': REACTIONS,
+    'on_reaction_clear_emoji': REACTIONS,
+    'on_raw_reaction_add': REACTIONS,
+    'on_raw_reaction_remove': REACTIONS,
+    'on_raw_reaction_clear': REACTIONS,
+    'on_raw_reaction_clear_emoji': REACTIONS,
+    'on_typing': ('guild_typing', 'dm_typing'),
+    'on_raw_typing': ('guild_typing', 'dm_typing'),
+    'on_member_join': ('members',),
+    'on_member_remove': ('members',),
+    'on_member_update': ('members',),
+    'on_raw_member_remove': ('members',),
+    'on_user_update': ('members',),
+    'on_presence_update': ('presences',),
+    'on_member_ban': ('moderation',),
+    'on_member_unban': ('moderation',),
+    'on_audit_log_entry_create': ('moderation',),
+    'on_voice_state_update': ('voice_states',),
+    'on_invite_create': ('invites',),
+    'on_invite_delete': ('invites',),
+    'on_integration_create': ('integrations',),
+    'on_integration_update': ('integrations',),
+    'on_guild_integrations_update': ('integrations',),
+    'on_raw_integration_delete': ('integrations',),
+    'on_webhooks_update': ('webhooks',),
+    'on_guild_emojis_update': ('emojis_and_stickers',),
+    'on_guild_stickers_update': ('emojis_and_stickers',),
+    'on_scheduled_event_create': ('guild_scheduled_events',),
+    'on_scheduled_event_delete': ('guild_scheduled_events',),
+    'on_scheduled_event_update': ('guild_scheduled_events',),
+    'on_scheduled_event_user_add': ('guild_scheduled_events',),
+    'on_scheduled_event_user_remove': ('guild_scheduled_events',),
+    'on_automod_rule_create': ('auto_moderation_configuration',),
+    'on_automod_rule_update': ('auto_moderation_configuration',),
+    'on_automod_rule_delete': ('auto_moderation_configuration',),
+    'on_automod_action': ('auto_moderation_execution',),
+    'on_poll_vote_add': ('guild_polls', 'dm_polls'),
+    'on_poll_vote_remove': ('guild_polls', 'dm_polls'),
+    'on_raw_poll_vote_add': ('guild_polls', 'dm_polls'),
+    'on_raw_poll_vote_remove': ('guild_polls', 'dm_polls')
+}
+
+# Actions that work with members keep them up to date with the members intent.
+ACTION_INTENTS = {
+    'add_role': ('members',),
+    'remove_role': ('members',),
+    'member_var': ('members',)
+}
+VARIABLE_ACTIONS = ('set_var', 'increment_var', 'delete_var')
+HANDLER_SECTIONS = ('commands', 'events', 'tasks', 'views', 'modals', 'triggers')
+
+def get_event_intents(event: str) -> tuple:
+    return EVENT_INTENTS.get(event, ())
+
+def iter_actions(data: Any) -> Iterator[str]:
+    # Walks every handler in bot.xml, member variables count as their own action whether they are changed or read.
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in VARIABLE_ACTIONS:
+                for item in value if isinstance(value, list) else [value]:
+                    if isinstance(item, dict) and item.get('@attributes', {}).get('scope') == 'member':
+                        yield 'member_var'
+            elif key in ACTION_INTENTS:
+                yield key
+            yield from iter_actions(value)
+    elif isinstance(data, list):
+        for item in data:
+            yield from iter_actions(item)
+    elif isinstance(data, str) and 'member_var(' in data:
+        yield 'member_var'
+
+def get_action_counts(bot_config: Dict[str, Any]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for section in HANDLER_SECTIONS:
+        for action in iter_actions(bot_config.get(section) or {}):
+            counts[action] = counts.get(action, 0) + 1
+    return counts
+
+def get_intents(bot_config: Dict[str, Any]) -> Tuple[discord.Intents, Dict[str, List[str]]]:
+    intents = discord.Intents.none()
+    reasons: Dict[str, List[str]] = {}
+
+    def enable(name: str, reason: str):
+        setattr(intents, name, True)
+        reasons.setdefault(name, []).append(reason)
+
+    enable('guilds', 'required for the server and channel caches')
+
+    prefix_commands = [
+        name for name, data in bot_config['commands'].items()
+        if not isinstance(data, dict) or data.get('@attributes', {}).get('prefix', True)
+    ]
+    if prefix_commands:
+        for intent in MESSAGE_CONTENT:
+            enable(intent, f'{len(prefix_commands)} prefix command(s)')
+
+    if bot_config.get('triggers'):
+        for intent in MESSAGE_CONTENT:
+            enable(intent, f"{len(bot_config['triggers'])} trigger(s)")
+
+    for name in bot_config['events']:
+        for intent in get_event_intents(name):
+            enable(intent, f'event {name}')
+
+    for action, count in get_action_counts(bot_config).items():
+        for intent in ACTION_INTENTS[action]:
+            enable(intent, f'{count} {action} action(s)' if action != 'member_var' else f'{count} member variable(s)')
+
+    extra = bot_config['config']['tags'].get('intents')
+    if extra == 'all':
+        for intent in discord.Intents.VALID_FLAGS:
+            if not getattr(intents, intent):
+                enable(intent, 'intents tag')
+    elif extra:
+        for intent in str(extra).replace(' ', '').split(','):
+            if intent not in discord.Intents.VALID_FLAGS:
+                raise ValueError(f"Invalid intent: '{intent}'")
+            enable(intent, 'intents tag')
+
+    return intents, reasons
+
+def get_member_cache_flags(value: Any, intents: discord.Intents) -> Optional[discord.MemberCacheFlags]:
+    if value is None or value == 'from_intents':
+        return None
+    if value is False or value == 'none':
+        return discord.MemberCacheFlags.none()
+    if value is True or value == 'all':
+        return discord.MemberCacheFlags.from_intents(intents)
+
+    flags = discord.MemberCacheFlags.none()
+    for flag in str(value).replace(' ', '').split(','):
+        if flag not in discord.MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Invalid member cache flag: '{flag}'")
+        setattr(flags, flag, True)
+    return flags
+
+def get_max_messages(value: Any) -> Optional[int]:
+    if value is None:
+        return 1000
+    if value is False or value == 'none':
+        return None
+    return int(value)
+
+def get_cache_options(tags: Dict[str, Any], intents: discord.Intents) -> Dict[str, Any]:
+    options = {'max_messages': get_max_messages(tags.get('max_messages'))}
+
+    member_cache_flags = get_member_cache_flags(tags.get('member_cache_flags'), intents)
+    if member_cache_flags is not None:
+        options['member_cache_flags'] = member_cache_flags
+
+    if 'chunk_guilds_at_startup' in tags:
+        options['chunk_guilds_at_startup'] = tags['chunk_guilds_at_startup'] == True
+
+    return options
+
+def print_intents_report(intents: discord.Intents, reasons: Dict[str, List[str]], options: Dict[str, Any]):
+    print('Enabled intents:')
+    for name, value in intents:
+        if value:
+            print(f'  {name}: {", ".join(reasons.get(name, []))}')
+
+    member_cache_flags = options.get('member_cache_flags', discord.MemberCacheFlags.from_intents(intents))
+    print(f"Member cache: {', '.join(name for name, value in member_cache_flags if value) or 'none'}")
+    print(f"Message cache: {options['max_messages'] if options['max_messages'] is not None else 'disabled'}")
+    if 'chunk_guilds_at_startup' in options:
+        print(f"Chunk guilds at startup: {options['chunk_guilds_at_startup']}")
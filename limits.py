@@ -0,0 +1,192 @@
+# limits.py
+
+import asyncio
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+from discord.ext import commands
+from filters import get_author, get_guild_id, get_channel_id
+from outbox import PRIORITIES, get_priority
+
+BUCKET_TYPES = {
+    'user': commands.BucketType.user,
+    'guild': commands.BucketType.guild,
+    'channel': commands.BucketType.channel,
+    'global': commands.BucketType.default
+}
+
+MIN_SWEEP_SIZE = 1024
+DEFAULT_LAG_INTERVAL = 0.5
+
+def get_bucket_key(bucket: str, subject: Any) -> int:
+    if bucket == 'global':
+        return 0
+    if bucket == 'channel':
+        return get_channel_id(subject) or 0
+    if bucket == 'guild':
+        # Like discord.py, direct messages count per user.
+        guild_id = get_guild_id(subject)
+        if guild_id is not None:
+            return guild_id
+    author = get_author(subject)
+    return author.id if author is not None else 0
+
+def get_bucket(value: Any) -> str:
+    bucket = str(value or 'user')
+    if bucket not in BUCKET_TYPES:
+        raise ValueError(f"Invalid bucket: '{bucket}'")
+    return bucket
+
+class TokenBuckets:
+    # Buckets are slots in two flat float arrays, the dict only maps a key to its slot.
+    # A bucket that refilled completely is the same as no bucket, so it is freed the next time the store is swept.
+    def __init__(self, rate: int, per: float, bucket: str = 'user'):
+        if rate < 1 or per <= 0:
+            raise ValueError(f"Invalid cooldown: rate='{rate}' per='{per}'")
+
+        self.rate = rate
+        self.per = per
+        self.bucket = get_bucket(bucket)
+        self.refill = rate / per
+        self.slots: Dict[int, int] = {}
+        self.tokens = array('d')
+        self.updated = array('d')
+        self.free: List[int] = []
+        self.sweep_at = MIN_SWEEP_SIZE
+
+        self.allowed = 0
+        self.limited = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def get_tokens(self, slot: int, now: float) -> float:
+        tokens = self.tokens[slot] + (now - self.updated[slot]) * self.refill
+        return tokens if tokens < self.rate else self.rate
+
+    def allocate(self, key: int, now: float) -> int:
+        if not self.free and len(self.slots) >= self.sweep_at:
+            self.sweep(now)
+
+        if self.free:
+            slot = self.free.pop()
+            self.tokens[slot] = self.rate
+            self.updated[slot] = now
+        else:
+            slot = len(self.tokens)
+            self.tokens.append(self.rate)
+            self.updated.append(now)
+        self.slots[key] = slot
+        return slot
+
+    def sweep(self, now: float):
+        expired = [key for key, slot in self.slots.items() if self.get_tokens(slot, now) >= self.rate]
+        for key in expired:
+            self.free.append(self.slots.pop(key))
+        # Sweeping again only after the store doubled keeps it amortized O(1) per hit.
+        self.sweep_at = max(MIN_SWEEP_SIZE, len(self.slots) * 2)
+
+    def hit(self, key: int, now: Optional[float] = None) -> float:
+        if now is None:
+            now = time.monotonic()
+
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.allocate(key, now)
+
+        tokens = self.get_tokens(slot, now)
+        self.updated[slot] = now
+        if tokens < 1:
+            self.tokens[slot] = tokens
+            self.limited += 1
+            return (1 - tokens) / self.refill
+
+        self.tokens[slot] = tokens - 1
+        self.allowed += 1
+        return 0.0
+
+    def check(self, subject: Any):
+        retry_after = self.hit(get_bucket_key(self.bucket, subject))
+        if retry_after:
+            raise commands.CommandOnCooldown(commands.Cooldown(self.rate, self.per), retry_after, BUCKET_TYPES[self.bucket])
+
+    def stats(self) -> Dict[str, int]:
+        return {'buckets': len(self.slots), 'slots': len(self.tokens), 'allowed': self.allowed, 'limited': self.limited}
+
+class ConcurrencyLimit:
+    def __init__(self, number: int, bucket: str = 'global'):
+        if number < 1:
+            raise ValueError(f"Invalid max_concurrency: '{number}'")
+
+        self.number = number
+        self.bucket = get_bucket(bucket)
+        self.running: Dict[int, int] = {}
+        self.limited = 0
+
+    def acquire(self, subject: Any) -> int:
+        key = get_bucket_key(self.bucket, subject)
+        running = self.running.get(key, 0)
+        if running >= self.number:
+            self.limited += 1
+            raise commands.MaxConcurrencyReached(self.number, BUCKET_TYPES[self.bucket])
+        self.running[key] = running + 1
+        return key
+
+    def release(self, key: int):
+        running = self.running[key] - 1
+        if running:
+            self.running[key] = running
+        else:
+            del self.running[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {'running': sum(self.running.values()), 'limited': self.limited}
+
+class BotOverloaded(commands.CommandError):
+    def __init__(self, lag: float):
+        self.lag = lag
+        super().__init__(f'The bot is overloaded right now (event loop lag {lag * 1000:.0f} ms), try again later.')
+
+class LoadShedder:
+    def __init__(self, threshold: float = 0.0, priority: Any = 'low', interval: float = DEFAULT_LAG_INTERVAL):
+        if threshold < 0 or interval <= 0:
+            raise ValueError(f"Invalid load shedding settings: threshold='{threshold}' interval='{interval}'")
+
+        self.threshold = threshold
+        self.priority = get_priority(priority)
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.monitor: Optional[asyncio.Task] = None
+        self.shed = 0
+
+    def is_enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self, always: bool = False):
+        # always keeps the lag up to date for metrics even when nothing is shed.
+        if (self.is_enabled() or always) and self.monitor is None:
+            self.monitor = asyncio.get_running_loop().create_task(self.measure())
+
+    def stop(self):
+        if self.monitor is not None:
+            self.monitor.cancel()
+            self.monitor = None
+
+    async def measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            # How much later than asked the sleep woke up is how long callbacks wait for the loop.
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            if self.lag > self.max_lag:
+                self.max_lag = self.lag
+
+    def check(self, priority: int = PRIORITIES['normal']):
+        if self.threshold and priority >= self.priority and self.lag > self.threshold:
+            self.shed += 1
+            raise BotOverloaded(self.lag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'lag': self.lag, 'max_lag': self.max_lag, 'threshold': self.threshold, 'shed': self.shed}
@@ -0,0 +1,97 @@
+# loader.py
+
+import hashlib
+import io
+import os
+import pickle
+import sys
+from typing import Any, Dict, Iterable, Optional
+from parser import add_child, iter_sections
+
+VERSION = 'a1.0.6'
+SECTIONS = ('config', 'commands', 'events', 'tasks', 'variables', 'views', 'modals', 'triggers')
+CACHE_EXTENSION = '.xmlc'
+# Bumped when the parsed data changes shape, so older caches are not reused.
+CACHE_FORMAT = 3
+
+def get_tags(config: Dict[str, Any]) -> Dict[str, Any]:
+    tag_list = config.pop('tag', [])
+    if isinstance(tag_list, dict):
+        tag_list = [tag_list]
+
+    return {
+        k: (v.lower() == 'true') if isinstance(v, str) and v.lower() in {'true', 'false'} else v
+        for item in tag_list if isinstance(item, dict)
+        for k, v in item.get('@attributes', {}).items()
+    }
+
+def normalize_sections(sections: Iterable) -> Dict[str, Any]:
+    collected = {}
+    for name, value in sections:
+        add_child(collected, name, value)
+
+    data = {section: collected.get(section) or {} for section in SECTIONS}
+    data['config']['tags'] = get_tags(data['config'])
+    return data
+
+def load_sections(source) -> Dict[str, Any]:
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return normalize_sections(iter_sections(source))
+
+def get_cache_key(content: bytes) -> str:
+    digest = hashlib.sha256(content)
+    digest.update(f'{VERSION}:{CACHE_FORMAT}:{",".join(SECTIONS)}:{sys.version_info[0]}.{sys.version_info[1]}'.encode())
+    return digest.hexdigest()
+
+def read_cache(cache_path: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_path, 'rb') as file:
+            cached_key, data = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return None
+    return data if cached_key == key else None
+
+def write_cache(cache_path: str, key: str, data: Dict[str, Any]) -> bool:
+    temp_path = f'{cache_path}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            pickle.dump((key, data), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        return False
+    return True
+
+def load_config(file: str = 'bot', use_cache: bool = True) -> Dict[str, Any]:
+    with open(f'{file}.xml', 'rb') as xml_file:
+        content = xml_file.read()
+
+    if not use_cache:
+        return load_sections(content)
+
+    key = get_cache_key(content)
+    cache_path = f'{file}{CACHE_EXTENSION}'
+    data = read_cache(cache_path, key)
+    if data is None:
+        data = load_sections(content)
+        write_cache(cache_path, key, data)
+    return data
+
+def compile_config(file: str = 'bot') -> str:
+    with open(f'{file}.xml', 'rb') as xml_file:
+        content = xml_file.read()
+
+    cache_path = f'{file}{CACHE_EXTENSION}'
+    if not write_cache(cache_path, get_cache_key(content), load_sections(content)):
+        raise OSError(f"Could not write '{cache_path}'")
+    return cache_path
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'compile':
+        print('Usage: python loader.py compile [file]')
+        sys.exit(1)
+
+    file = sys.argv[2] if len(sys.argv) > 2 else 'bot'
+    if file.endswith('.xml'):
+        file = file[:-4]
+    print(f'Compiled {file}.xml to {compile_config(file)}')
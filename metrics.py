@@ -0,0 +1,300 @@
+# metrics.py
+
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import aiohttp
+from aiohttp import web
+
+EXPORTERS = ('prometheus', 'json')
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, labels, help)
+METRICS = {
+    'xmlcord_handler_seconds': ('histogram', ('type', 'name'), 'Time spent in command, event, task, trigger, component and modal handlers.'),
+    'xmlcord_handler_errors_total': ('counter', ('type', 'name', 'error'), 'Handler errors by exception type.'),
+    'xmlcord_action_seconds': ('histogram', ('action',), 'Time spent in each action.'),
+    'xmlcord_action_errors_total': ('counter', ('action', 'error'), 'Action errors by exception type.'),
+    'xmlcord_rest_request_seconds': ('histogram', ('method', 'route'), 'Duration of Discord API requests.'),
+    'xmlcord_rest_requests_total': ('counter', ('method', 'route', 'status'), 'Discord API requests by response status.'),
+    'xmlcord_rest_ratelimited_total': ('counter', ('method', 'route'), 'Discord API requests answered with 429.'),
+    'xmlcord_rest_errors_total': ('counter', ('method', 'route', 'error'), 'Discord API requests that failed without a response.')
+}
+
+ID_PATTERN = re.compile(r'/\d{5,}')
+TOKEN_PATTERN = re.compile(r'(/(?:interactions|webhooks)/\{id\})/[^/]+')
+
+def get_route(path: str) -> str:
+    # IDs and interaction tokens would give every request its own series.
+    path = path.split('/api/v10', 1)[-1]
+    return TOKEN_PATTERN.sub(r'\1/{token}', ID_PATTERN.sub('/{id}', path))
+
+def escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    labels = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+def get_metric_name(*parts: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(('xmlcord',) + parts))
+
+def flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    values = {}
+    for key, value in data.items():
+        name = f'{prefix}_{key}' if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            values[name] = float(value)
+    return values
+
+def get_exporters(value: Any) -> tuple:
+    if value is True:
+        return ('prometheus',)
+    if not value or value is False:
+        return ()
+    exporters = tuple(str(value).replace(' ', '').split(','))
+    for exporter in exporters:
+        if exporter not in EXPORTERS:
+            raise ValueError(f"Invalid metrics exporter: '{exporter}'")
+    return exporters
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(DEFAULT_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(DEFAULT_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'avg': self.total / self.count if self.count else 0.0,
+            'buckets': {str(bound): count for bound, count in zip(DEFAULT_BUCKETS + ('+Inf',), self.counts)}
+        }
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.exporters: tuple = ()
+        self.host = '127.0.0.1'
+        self.port = 9100
+        self.file = 'metrics.json'
+        self.interval = 60.0
+
+        self.histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.collectors: Dict[str, Tuple[Callable[[], Dict[str, Any]], bool]] = {}
+
+        self.runner: Optional[web.AppRunner] = None
+        self.writer: Optional[asyncio.Task] = None
+
+    def configure(self, tags: Dict[str, Any], instance: int = 0):
+        self.exporters = get_exporters(tags.get('metrics'))
+        self.enabled = bool(self.exporters)
+        self.host = str(tags.get('metrics_host', '127.0.0.1'))
+        # Every cluster process gets its own port and file.
+        self.port = int(tags.get('metrics_port', 9100)) + instance
+        file = str(tags.get('metrics_file', 'metrics.json'))
+        if instance:
+            stem, extension = os.path.splitext(file)
+            file = f'{stem}.{instance}{extension}'
+        self.file = file
+        self.interval = float(tags.get('metrics_interval', 60))
+
+    def observe(self, metric: str, labels: tuple, value: float):
+        series = self.histograms.setdefault(metric, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(value)
+
+    def increment(self, metric: str, labels: tuple, amount: float = 1):
+        series = self.counters.setdefault(metric, {})
+        series[labels] = series.get(labels, 0) + amount
+
+    def add_collector(self, name: str, collect: Callable[[], Dict[str, Any]], labeled: bool = False):
+        self.collectors[name] = (collect, labeled)
+
+    def timed(self, kind: str, name: str, func: Callable) -> Callable:
+        # Disabled metrics hand back the function itself, so they cost nothing per call.
+        if not self.enabled:
+            return func
+
+        labels = (kind, name)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                self.increment('xmlcord_handler_errors_total', labels + (type(e).__name__,))
+                raise
+            finally:
+                self.observe('xmlcord_handler_seconds', labels, time.perf_counter() - start)
+        return wrapper
+
+    def wrap_action(self, action: str, step: Callable) -> Callable:
+        if not self.enabled:
+            return step
+
+        labels = (action,)
+
+        async def wrapper(context):
+            start = time.perf_counter()
+            try:
+                await step(context)
+            except Exception as e:
+                self.increment('xmlcord_action_errors_total', labels + (type(e).__name__,))
+                raise
+            finally:
+                self.observe('xmlcord_action_seconds', labels, time.perf_counter() - start)
+        return wrapper
+
+    def create_trace(self) -> Optional[aiohttp.TraceConfig]:
+        if not self.enabled:
+            return None
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self.on_request_start)
+        trace.on_request_end.append(self.on_request_end)
+        trace.on_request_exception.append(self.on_request_exception)
+        return trace
+
+    async def on_request_start(self, session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(self, session, context, params):
+        labels = (params.method, get_route(params.url.path))
+        status = params.response.status
+        self.observe('xmlcord_rest_request_seconds', labels, time.perf_counter() - context.start)
+        self.increment('xmlcord_rest_requests_total', labels + (str(status),))
+        if status == 429:
+            self.increment('xmlcord_rest_ratelimited_total', labels)
+
+    async def on_request_exception(self, session, context, params):
+        self.increment('xmlcord_rest_errors_total', (params.method, get_route(params.url.path), type(params.exception).__name__))
+
+    def collect(self) -> Dict[str, Any]:
+        stats = {}
+        for name, (collect, _) in self.collectors.items():
+            try:
+                stats[name] = collect()
+            except Exception as e:
+                print(f'Could not collect {name} metrics: {e}')
+        return stats
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric, (kind, names, help) in METRICS.items():
+            series = self.histograms.get(metric) if kind == 'histogram' else self.counters.get(metric)
+            if not series:
+                continue
+            lines.append(f'# HELP {metric} {help}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for labels, value in series.items():
+                if kind == 'counter':
+                    lines.append(f'{metric}{format_labels(names, labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(DEFAULT_BUCKETS + ('+Inf',), value.counts):
+                    cumulative += count
+                    le = 'le="' + str(bound) + '"'
+                    lines.append(f'{metric}_bucket{format_labels(names, labels, le)} {cumulative}')
+                lines.append(f'{metric}_sum{format_labels(names, labels)} {value.total}')
+                lines.append(f'{metric}_count{format_labels(names, labels)} {value.count}')
+
+        for source, data in self.collect().items():
+            labeled = self.collectors[source][1]
+            gauges: Dict[str, List[str]] = {}
+            for name, values in (data.items() if labeled else ((None, data),)):
+                if not isinstance(values, dict):
+                    continue
+                for key, value in flatten(values).items():
+                    gauges.setdefault(get_metric_name(source, key), []).append(
+                        f'{format_labels(("name",), (name,)) if labeled else ""} {value}'
+                    )
+            for metric, samples in gauges.items():
+                lines.append(f'# TYPE {metric} gauge')
+                lines.extend(f'{metric}{sample}' for sample in samples)
+
+        lines.append('')
+        return '\n'.join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'time': time.time(),
+            'histograms': {
+                metric: [dict(zip(METRICS[metric][1], labels), **histogram.to_dict()) for labels, histogram in series.items()]
+                for metric, series in self.histograms.items()
+            },
+            'counters': {
+                metric: [dict(zip(METRICS[metric][1], labels), value=value) for labels, value in series.items()]
+                for metric, series in self.counters.items()
+            },
+            'stats': self.collect()
+        }
+
+    def write(self):
+        temp_path = f'{self.file}.tmp'
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(self.to_dict(), file, default=str)
+            os.replace(temp_path, self.file)
+        except OSError as e:
+            print(f"Could not write metrics to '{self.file}': {e}")
+
+    async def write_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write()
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+    async def get_json(self, request: web.Request) -> web.Response:
+        return web.json_response(self.to_dict(), dumps=lambda data: json.dumps(data, default=str))
+
+    async def start(self):
+        if 'prometheus' in self.exporters and self.runner is None:
+            app = web.Application()
+            app.add_routes([web.get('/metrics', self.get_metrics), web.get('/metrics.json', self.get_json)])
+            self.runner = web.AppRunner(app)
+            await self.runner.setup()
+            try:
+                await web.TCPSite(self.runner, self.host, self.port).start()
+            except OSError as e:
+                print(f'Could not start the metrics server on {self.host}:{self.port}: {e}')
+                await self.runner.cleanup()
+                self.runner = None
+            else:
+                print(f'Metrics available on http://{self.host}:{self.port}/metrics')
+
+        if 'json' in self.exporters and self.writer is None:
+            self.writer = asyncio.get_running_loop().create_task(self.write_periodically())
+
+    async def stop(self):
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics = Metrics()
@@ -0,0 +1,197 @@
+# outbox.py
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+DROP_POLICIES = ('drop_oldest', 'drop_newest', 'wait')
+
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS = 10
+COALESCE_KEYS = frozenset(('content', 'embed', 'embeds'))
+
+def get_priority(value: Any) -> int:
+    if value is None:
+        return PRIORITIES['normal']
+    if isinstance(value, str) and value in PRIORITIES:
+        return PRIORITIES[value]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid priority: '{value}'") from None
+
+def get_embeds(data: Dict[str, Any]) -> list:
+    embeds = list(data.get('embeds') or ())
+    if data.get('embed') is not None:
+        embeds.append(data['embed'])
+    return embeds
+
+class OutboundMessage:
+    __slots__ = ('priority', 'sequence', 'data', 'coalesce', 'queued_at')
+
+    def __init__(self, priority: int, sequence: int, data: Dict[str, Any], coalesce: bool):
+        self.priority = priority
+        self.sequence = sequence
+        self.data = data
+        self.coalesce = coalesce and COALESCE_KEYS.issuperset(data)
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: 'OutboundMessage') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class ChannelQueue:
+    __slots__ = ('channel', 'messages', 'worker', 'space')
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.messages: List[OutboundMessage] = []
+        self.worker: Optional[asyncio.Task] = None
+        self.space = asyncio.Event()
+
+class Outbox:
+    def __init__(self, enabled: bool = False, max_size: int = 100, policy: str = 'drop_oldest', coalesce: bool = False):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Invalid send queue policy: '{policy}'")
+        if max_size < 1:
+            raise ValueError(f"Invalid send queue size: '{max_size}'")
+
+        self.enabled = enabled
+        self.max_size = max_size
+        self.policy = policy
+        self.coalesce = coalesce
+        self.queues: Dict[int, ChannelQueue] = {}
+        self.counter = itertools.count()
+
+        self.enqueued = 0
+        self.sent = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def use(self, queue: Optional[bool]) -> bool:
+        return self.enabled if queue is None else queue
+
+    async def put(self, channel, data: Dict[str, Any], priority: int = PRIORITIES['normal'], coalesce: Optional[bool] = None) -> bool:
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = ChannelQueue(channel)
+
+        while len(queue.messages) >= self.max_size:
+            if self.policy == 'drop_newest':
+                self.dropped += 1
+                return False
+            if self.policy == 'drop_oldest':
+                self.evict(queue)
+                break
+            queue.space.clear()
+            await queue.space.wait()
+
+        message = OutboundMessage(priority, next(self.counter), data, self.coalesce if coalesce is None else coalesce)
+        heapq.heappush(queue.messages, message)
+        self.enqueued += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+        if queue.worker is None:
+            queue.worker = asyncio.get_running_loop().create_task(self.work(channel.id, queue))
+        return True
+
+    def evict(self, queue: ChannelQueue):
+        # The message that would be sent last goes first: lowest priority, then oldest within it.
+        lowest = max(message.priority for message in queue.messages)
+        victim = min((message for message in queue.messages if message.priority == lowest), key=lambda message: message.sequence)
+        queue.messages.remove(victim)
+        heapq.heapify(queue.messages)
+        self.dropped += 1
+        self.depth -= 1
+
+    def take(self, queue: ChannelQueue) -> List[OutboundMessage]:
+        first = heapq.heappop(queue.messages)
+        batch = [first]
+        if not first.coalesce:
+            return batch
+
+        content = first.data.get('content')
+        length = len(str(content)) if content is not None else 0
+        embeds = len(get_embeds(first.data))
+        while queue.messages and queue.messages[0].coalesce:
+            data = queue.messages[0].data
+            content = data.get('content')
+            extra = len(str(content)) + (1 if length else 0) if content is not None else 0
+            extra_embeds = len(get_embeds(data))
+            if length + extra > MAX_CONTENT_LENGTH or embeds + extra_embeds > MAX_EMBEDS:
+                break
+            length += extra
+            embeds += extra_embeds
+            batch.append(heapq.heappop(queue.messages))
+        return batch
+
+    def merge(self, batch: List[OutboundMessage]) -> Dict[str, Any]:
+        if len(batch) == 1:
+            return batch[0].data
+
+        contents = [str(message.data['content']) for message in batch if message.data.get('content') is not None]
+        embeds = [embed for message in batch for embed in get_embeds(message.data)]
+        data: Dict[str, Any] = {}
+        if contents:
+            data['content'] = '\n'.join(contents)
+        if embeds:
+            data['embeds'] = embeds
+        return data
+
+    async def work(self, channel_id: int, queue: ChannelQueue):
+        try:
+            while queue.messages:
+                batch = self.take(queue)
+                self.depth -= len(batch)
+                queue.space.set()
+
+                # A 429 only makes discord.py sleep here, the handlers that queued the messages already moved on.
+                try:
+                    await queue.channel.send(**self.merge(batch))
+                except Exception as e:
+                    self.errors += 1
+                    print(f'Could not send queued message to channel {channel_id}: {e}')
+                    continue
+                finally:
+                    self.requests += 1
+
+                now = time.perf_counter()
+                self.sent += len(batch)
+                self.coalesced += len(batch) - 1
+                for message in batch:
+                    latency = now - message.queued_at
+                    self.total_latency += latency
+                    if latency > self.max_latency:
+                        self.max_latency = latency
+        finally:
+            queue.worker = None
+            if not queue.messages and self.queues.get(channel_id) is queue:
+                del self.queues[channel_id]
+
+    def get_depths(self) -> Dict[int, int]:
+        return {channel_id: len(queue.messages) for channel_id, queue in self.queues.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enqueued': self.enqueued,
+            'sent': self.sent,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'channels': len(self.queues),
+            'avg_latency': self.total_latency / self.sent if self.sent else 0.0,
+            'max_latency': self.max_latency
+        }
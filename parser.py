@@ -1,6 +1,7 @@
 # parser.py
 
 import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, Tuple
 
 def convert_bool(value):
     if value.lower() == 'true':
@@ -41,6 +42,64 @@ def xml_to_dict(element) -> dict:
 
     return result
 
+def clean_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(data, dict):
+        if '#text' in data:
+            # Attributes next to text, e.g. <run_script executor='thread'>, are kept with it.
+            if '@attributes' in data:
+                return {'@attributes': data['@attributes'], '#text': data['#text']}
+            return data['#text']
+        return {k: clean_data(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [clean_data(item) for item in data]
+    return data
+
+def add_child(data: dict, key: str, value: Any):
+    if key in data:
+        if isinstance(data[key], list):
+            data[key].append(value)
+        else:
+            data[key] = [data[key], value]
+    else:
+        data[key] = value
+
+def iter_sections(source) -> Iterator[Tuple[str, Any]]:
+    depth = 0
+    root = None
+    section = None
+
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = element
+                if root.tag != 'bot':
+                    raise ET.ParseError(f"Root element must be <bot>, not <{root.tag}>")
+            elif depth == 2:
+                section = {}
+            continue
+
+        if depth == 3:
+            add_child(section, element.tag, clean_data(xml_to_dict(element)[element.tag]))
+            element.clear()
+
+        elif depth == 2:
+            text = element.text.strip() if element.text else ''
+            attributes = {key: convert_bool(value) for key, value in element.attrib.items()}
+            if text:
+                # Same as clean_data: an element with text is reduced to its text, and its attributes if it has any.
+                yield element.tag, {'@attributes': attributes, '#text': convert_bool(text)} if attributes else convert_bool(text)
+            elif attributes:
+                yield element.tag, {'@attributes': attributes, **section}
+            else:
+                yield element.tag, section
+
+            section = None
+            element.clear()
+            root.remove(element)
+
+        depth -= 1
+
 def parse(file) -> dict:
     tree = ET.parse(f'{file}.xml')
     root = tree.getroot()
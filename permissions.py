@@ -0,0 +1,31 @@
+# permissions.py
+
+import discord
+from discord.ext import commands
+
+def get_permission_names(data: dict) -> tuple:
+    permissions_data = data.get('permissions')
+    permissions = []
+
+    if isinstance(permissions_data, dict):
+        for perm_name, perm_value in permissions_data.items():
+            if perm_name == '@attributes':
+                for perm, value in perm_value.items():
+                    if value == True:
+                        permissions.append(perm)
+            else:
+                permissions.append(perm_name)
+
+    return tuple(permissions)
+
+def get_permissions(data: dict) -> discord.Permissions:
+    names = get_permission_names(data)
+    invalid = [name for name in names if name not in discord.Permissions.VALID_FLAGS]
+    if invalid:
+        raise ValueError(f"Invalid permissions: {', '.join(invalid)}")
+    return discord.Permissions(**{name: True for name in names})
+
+def check_permissions(required: int, user: discord.Member):
+    if user.guild_permissions.value & required != required:
+        missing = discord.Permissions(required & ~user.guild_permissions.value)
+        raise commands.MissingPermissions([perm for perm, value in missing if value])
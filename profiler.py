@@ -0,0 +1,272 @@
+# profiler.py
+
+import asyncio
+import cProfile
+import functools
+import json
+import os
+import pstats
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import aiohttp
+from metrics import get_route
+
+PROFILE_MODES = ('slow', 'sample')
+MAX_STACK_DEPTH = 64
+
+# The spans of the handler that is running in the current task, None outside of profiled handlers.
+current_spans: ContextVar[Optional[List[Tuple[str, float, float]]]] = ContextVar('current_spans', default=None)
+
+def get_modes(value: Any) -> tuple:
+    if value is True:
+        return ('slow',)
+    if not value or value is False:
+        return ()
+    modes = tuple(str(value).replace(' ', '').split(','))
+    for mode in modes:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode: '{mode}'")
+    return modes
+
+def get_file_name(kind: str, name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_.-]', '_', f'{kind}-{name}')
+
+def get_label(func: tuple) -> str:
+    file, line, name = func
+    if file == '~':
+        return name
+    return f'{name} ({os.path.basename(file)}:{line})'
+
+def collapse(stats: Dict[tuple, tuple]) -> Dict[str, int]:
+    # cProfile only keeps caller -> callee edges, so full stacks are rebuilt by following the edges
+    # from the roots and splitting a function's own time by how much of it each caller accounts for.
+    callees: Dict[tuple, List[Tuple[tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks: Dict[str, int] = {}
+
+    def walk(func: tuple, path: tuple, labels: tuple, share: float):
+        _, _, own_time, total_time, _ = stats[func]
+        labels += (get_label(func),)
+        weight = int(own_time * share * 1e6)
+        if weight:
+            key = ';'.join(labels)
+            stacks[key] = stacks.get(key, 0) + weight
+        if len(labels) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_time = stats[callee][3]
+            if callee in path or not callee_time:
+                continue
+            walk(callee, path + (callee,), labels, share * edge_time / callee_time)
+
+    for func, value in stats.items():
+        if not value[4]:
+            walk(func, (func,), (), 1.0)
+    return stacks
+
+class Profiled:
+    # Drives a coroutine and only profiles while it runs, so other tasks that run while it awaits are left out.
+    def __init__(self, coroutine, profile: cProfile.Profile):
+        self.coroutine = coroutine
+        self.profile = profile
+
+    def __await__(self):
+        coroutine = self.coroutine
+        value, error = None, None
+        while True:
+            self.profile.enable()
+            try:
+                if error is None:
+                    future = coroutine.send(value)
+                else:
+                    future = coroutine.throw(error)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.profile.disable()
+
+            try:
+                value, error = (yield future), None
+            except BaseException as e:
+                value, error = None, e
+
+class Profiler:
+    def __init__(self):
+        self.modes: tuple = ()
+        self.threshold = 0.5
+        self.sample_rate = 100
+        self.directory = 'profiles'
+        self.instance = 0
+
+        self.calls = 0
+        self.slow = 0
+        self.sampled = 0
+        self.sampling = False
+        # Only used by the writer thread.
+        self.samples: Dict[Tuple[str, str], pstats.Stats] = {}
+        self.writer: Optional[ThreadPoolExecutor] = None
+        self.pending: Set[asyncio.Future] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.modes)
+
+    def configure(self, tags: Dict[str, Any], instance: int = 0):
+        self.modes = get_modes(tags.get('profile'))
+        self.threshold = float(tags.get('profile_threshold', 0.5))
+        self.sample_rate = int(tags.get('profile_sample', 100))
+        self.directory = str(tags.get('profile_dir', 'profiles'))
+        self.instance = instance
+        if self.threshold < 0 or self.sample_rate < 1:
+            raise ValueError(f"Invalid profile settings: threshold='{self.threshold}' sample='{self.sample_rate}'")
+
+    def get_path(self, file_name: str) -> str:
+        # Every cluster process writes its own files.
+        if self.instance:
+            file_name = f'{self.instance}.{file_name}'
+        return os.path.join(self.directory, file_name)
+
+    def start_sample(self) -> Optional[cProfile.Profile]:
+        # Only one sampled handler runs at a time; cProfile can't nest and one sample per N is all we need.
+        if 'sample' not in self.modes or self.sampling or self.calls % self.sample_rate:
+            return None
+        self.sampling = True
+        self.sampled += 1
+        return cProfile.Profile()
+
+    def wrap(self, kind: str, name: str, func: Callable) -> Callable:
+        # Without profiling the function itself is used, unsampled calls only pay for a few counters.
+        if not self.modes:
+            return func
+
+        collect_spans = 'slow' in self.modes
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            self.calls += 1
+            token = current_spans.set([]) if collect_spans else None
+            profile = self.start_sample()
+            start = time.perf_counter()
+            try:
+                if profile is None:
+                    return await func(*args, **kwargs)
+                return await Profiled(func(*args, **kwargs), profile)
+            finally:
+                duration = time.perf_counter() - start
+                if profile is not None:
+                    self.sampling = False
+                    self.save_sample(kind, name, profile)
+                if token is not None:
+                    spans = current_spans.get()
+                    current_spans.reset(token)
+                    if duration >= self.threshold:
+                        self.report(kind, name, start, duration, spans)
+        return wrapper
+
+    def wrap_action(self, action: str, step: Callable) -> Callable:
+        if 'slow' not in self.modes:
+            return step
+
+        async def wrapper(context):
+            spans = current_spans.get()
+            if spans is None:
+                return await step(context)
+            start = time.perf_counter()
+            try:
+                await step(context)
+            finally:
+                spans.append((action, start, time.perf_counter() - start))
+        return wrapper
+
+    def create_trace(self, trace: Optional[aiohttp.TraceConfig] = None) -> Optional[aiohttp.TraceConfig]:
+        # Discord API requests show up as spans of the handler that made them.
+        if 'slow' not in self.modes:
+            return trace
+
+        if trace is None:
+            trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self.on_request_start)
+        trace.on_request_end.append(self.on_request_end)
+        trace.on_request_exception.append(self.on_request_end)
+        return trace
+
+    async def on_request_start(self, session, context, params):
+        context.span_start = time.perf_counter()
+
+    async def on_request_end(self, session, context, params):
+        spans = current_spans.get()
+        if spans is not None:
+            spans.append((f'{params.method} {get_route(params.url.path)}', context.span_start, time.perf_counter() - context.span_start))
+
+    def write_later(self, func: Callable, *args):
+        # Reports and samples are written by one thread in order, profiled handlers never wait for the disk.
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profiler')
+        future = asyncio.get_running_loop().run_in_executor(self.writer, func, *args)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+
+    async def flush(self):
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+    def report(self, kind: str, name: str, start: float, duration: float, spans: List[Tuple[str, float, float]]):
+        self.slow += 1
+        lines = [f"Slow {kind} '{name}': {duration * 1000:.1f} ms"]
+        for span, span_start, span_duration in sorted(spans, key=lambda span: span[1]):
+            lines.append(f'  {span}: {span_duration * 1000:.1f} ms (at +{(span_start - start) * 1000:.1f} ms)')
+
+        record = {
+            'time': time.time(),
+            'type': kind,
+            'name': name,
+            'duration': duration,
+            'spans': [{'name': span, 'start': span_start - start, 'duration': span_duration} for span, span_start, span_duration in spans]
+        }
+        self.write_later(self.write_report, kind, '\n'.join(lines), record)
+
+    def write_report(self, kind: str, text: str, record: Dict[str, Any]):
+        print(text)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.get_path('slow.jsonl'), 'a') as file:
+                file.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            print(f'Could not save slow {kind} report: {e}')
+
+    def save_sample(self, kind: str, name: str, profile: cProfile.Profile):
+        self.write_later(self.write_sample, kind, name, profile)
+
+    def write_sample(self, kind: str, name: str, profile: cProfile.Profile):
+        # Samples of the same handler are added up, so there is one growing profile per handler.
+        key = (kind, name)
+        try:
+            stats = self.samples.get(key)
+            if stats is None:
+                stats = self.samples[key] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        except TypeError:
+            # Nothing was recorded, e.g. the handler finished without running any Python code.
+            return
+
+        base_path = self.get_path(get_file_name(kind, name))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stats.dump_stats(f'{base_path}.prof')
+            with open(f'{base_path}.collapsed', 'w') as file:
+                for stack, weight in collapse(stats.stats).items():
+                    file.write(f'{stack} {weight}\n')
+        except OSError as e:
+            print(f'Could not save {kind} profile: {e}')
+
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls, 'slow': self.slow, 'sampled': self.sampled}
+
+profiler = Profiler()
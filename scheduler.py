@@ -0,0 +1,291 @@
+# scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+TaskFunction = Callable[[], Awaitable[None]]
+
+MISSED_POLICIES = ('skip', 'catch_up')
+MAX_CATCH_UP = 10
+MAX_CRON_YEARS = 8
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+def parse_cron_field(value: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in value.split(','):
+        step = 1
+        if '/' in part:
+            part, step_value = part.split('/', 1)
+            step = int(step_value)
+
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step != 1 else start
+
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid cron field: '{value}'")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+class CronSchedule:
+    __slots__ = ('expression', 'minutes', 'hours', 'days', 'months', 'weekdays', 'any_day', 'any_weekday')
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields (minute hour day month weekday): '{expression}'")
+
+        self.minutes = parse_cron_field(fields[0], 0, 59)
+        self.hours = parse_cron_field(fields[1], 0, 23)
+        self.days = parse_cron_field(fields[2], 1, 31)
+        self.months = parse_cron_field(fields[3], 1, 12)
+        # Both 0 and 7 mean Sunday.
+        self.weekdays = frozenset(day % 7 for day in parse_cron_field(fields[4], 0, 7))
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def matches_day(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron, a restricted day of month and day of week match when either of them does.
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = current + timedelta(days=366 * MAX_CRON_YEARS)
+
+        while current < limit:
+            if current.month not in self.months:
+                year, month = (current.year + 1, 1) if current.month == 12 else (current.year, current.month + 1)
+                current = current.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self.matches_day(current):
+                current = (current + timedelta(days=1)).replace(hour=0, minute=0)
+            elif current.hour not in self.hours:
+                current = (current + timedelta(hours=1)).replace(minute=0)
+            elif current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+            else:
+                return current
+
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
+
+class ScheduledTask:
+    def __init__(self, name: str, func: TaskFunction, interval: Optional[float] = None, cron: Optional[str] = None, jitter: float = 0.0, missed: str = 'skip', max_concurrency: int = 1):
+        if cron is None and not interval:
+            raise ValueError(f"Task '{name}' needs an interval (hours, minutes, seconds) or a cron expression")
+        if interval is not None and interval < 0:
+            raise ValueError(f"Task '{name}' has a negative interval")
+        if missed not in MISSED_POLICIES:
+            raise ValueError(f"Invalid missed policy for task '{name}': '{missed}'")
+        if max_concurrency < 1:
+            raise ValueError(f"Invalid max_concurrency for task '{name}': '{max_concurrency}'")
+
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = CronSchedule(cron) if cron is not None else None
+        self.jitter = jitter
+        self.missed_policy = missed
+        self.max_concurrency = max_concurrency
+
+        self.due = 0.0
+        self.entry: Optional[list] = None
+        self.running = 0
+
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self.missed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_run: Optional[float] = None
+
+    def get_first(self, now: float) -> float:
+        # Interval tasks run right away like tasks.loop did, cron tasks wait for their first match.
+        if self.cron is None:
+            return now
+        return self.get_next_cron(now)
+
+    def get_next(self, now: float) -> tuple:
+        if self.cron is None:
+            missed = int((now - self.due) // self.interval)
+            return self.due + (missed + 1) * self.interval, missed
+
+        due = self.get_next_cron(self.due)
+        missed = 0
+        while due <= now and missed < MAX_CATCH_UP:
+            due = self.get_next_cron(due)
+            missed += 1
+        if due <= now:
+            due = self.get_next_cron(now)
+        return due, missed
+
+    def get_next_cron(self, after: float) -> float:
+        # Cron runs on wall-clock time, the heap uses loop time.
+        offset = time.time() - asyncio.get_running_loop().time()
+        moment = self.cron.next_after(datetime.fromtimestamp(after + offset))
+        return moment.timestamp() - offset
+
+    def record(self, elapsed: float):
+        self.runs += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.last_run = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'missed': self.missed,
+            'running': self.running,
+            'total_time': self.total_time,
+            'avg_time': self.total_time / self.runs if self.runs else 0.0,
+            'max_time': self.max_time,
+            'last_run': self.last_run
+        }
+
+class Scheduler:
+    def __init__(self, max_concurrency: int = 0):
+        self.max_concurrency = max_concurrency
+        self.tasks: Dict[str, ScheduledTask] = {}
+        self.queue: List[list] = []
+        self.counter = itertools.count()
+
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.runner: Optional[asyncio.Task] = None
+        self.active: Set[asyncio.Task] = set()
+
+    def is_running(self) -> bool:
+        return self.runner is not None
+
+    def add(self, task: ScheduledTask):
+        self.remove(task.name)
+        self.tasks[task.name] = task
+        if self.runner is not None:
+            self.push(task, task.get_first(asyncio.get_running_loop().time()))
+
+    def remove(self, name: str):
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            # The heap entry is skipped when it comes up instead of being searched for now.
+            task.entry = None
+
+    def start(self):
+        if self.runner is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        if self.max_concurrency:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        now = loop.time()
+        for task in self.tasks.values():
+            self.push(task, task.get_first(now))
+        self.runner = loop.create_task(self.run())
+
+    def stop(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+        for running in list(self.active):
+            running.cancel()
+        self.queue.clear()
+        for task in self.tasks.values():
+            task.entry = None
+
+    def push(self, task: ScheduledTask, due: float):
+        task.due = due
+        run_at = due + random.uniform(0, task.jitter) if task.jitter else due
+        task.entry = [run_at, next(self.counter), task]
+        heapq.heappush(self.queue, task.entry)
+
+        if self.queue[0] is task.entry and self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while self.queue and self.queue[0][2].entry is not self.queue[0]:
+                heapq.heappop(self.queue)
+
+            timeout = self.queue[0][0] - loop.time() if self.queue else None
+            if timeout is None or timeout > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            run_at, _, task = heapq.heappop(self.queue)
+            self.fire(task, run_at, loop.time())
+
+    def fire(self, task: ScheduledTask, run_at: float, now: float):
+        # Jitter only delays this run, it must not count as a missed one.
+        due, missed = task.get_next(task.due + now - run_at)
+        runs = 1
+        if missed:
+            task.missed += missed
+            if task.missed_policy == 'catch_up':
+                runs += min(missed, MAX_CATCH_UP)
+        self.push(task, due)
+
+        if task.running >= task.max_concurrency:
+            task.skipped += 1
+            return
+
+        task.running += 1
+        running = asyncio.get_running_loop().create_task(self.execute(task, runs))
+        self.active.add(running)
+        running.add_done_callback(self.active.discard)
+
+    async def execute(self, task: ScheduledTask, runs: int):
+        try:
+            for _ in range(runs):
+                if self.semaphore is None:
+                    await self.call(task)
+                else:
+                    async with self.semaphore:
+                        await self.call(task)
+        finally:
+            task.running -= 1
+
+    async def call(self, task: ScheduledTask):
+        start = time.perf_counter()
+        try:
+            await task.func()
+        except Exception:
+            task.errors += 1
+            print(f'Task {task.name} failed:')
+            traceback.print_exc()
+        finally:
+            task.record(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: task.to_dict() for name, task in self.tasks.items()}
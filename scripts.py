@@ -0,0 +1,154 @@
+# scripts.py
+
+import ast
+import asyncio
+import hashlib
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from types import CodeType
+from typing import Any, Dict, Optional
+from templates import Template, Constant
+from variables import Variables
+
+EXECUTORS = (None, 'thread', 'process')
+PLAIN_TYPES = (str, int, float, bool, list, dict, tuple, type(None))
+# Scripts with placeholders are compiled per rendered source, only the most recent ones are kept.
+CODE_CACHE_SIZE = 256
+
+script_globals: Dict[str, Any] = {}
+script_stats: Dict[str, 'ScriptStats'] = {}
+
+pool_sizes = {'thread': 4, 'process': 2}
+pools: Dict[str, Any] = {}
+
+class ScriptStats:
+    __slots__ = ('calls', 'errors', 'timeouts', 'total_time', 'max_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'total_time': self.total_time,
+            'avg_time': self.total_time / self.calls if self.calls else 0.0,
+            'max_time': self.max_time
+        }
+
+def get_source_hash(source: str) -> str:
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def compile_script(source: str, is_async: bool = False) -> CodeType:
+    flags = ast.PyCF_ALLOW_TOP_LEVEL_AWAIT if is_async else 0
+    return compile(source, f'<run_script {get_source_hash(source)[:8]}>', 'exec', flags=flags)
+
+def configure_pools(threads: Optional[int] = None, processes: Optional[int] = None):
+    if threads:
+        pool_sizes['thread'] = threads
+    if processes:
+        pool_sizes['process'] = processes
+
+def get_pool(executor: str):
+    pool = pools.get(executor)
+    if pool is None:
+        if executor == 'thread':
+            pool = ThreadPoolExecutor(max_workers=pool_sizes['thread'], thread_name_prefix='run_script')
+        else:
+            pool = ProcessPoolExecutor(max_workers=pool_sizes['process'])
+        pools[executor] = pool
+    return pool
+
+def shutdown_pools():
+    for pool in pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    pools.clear()
+
+def run_in_process(source: str, namespace: Dict[str, Any]):
+    exec(compile_script(source), {'__builtins__': __builtins__}, namespace)
+
+def get_plain_vars(vars: Dict[str, Any]) -> Dict[str, Any]:
+    # A process can't look variables up later, it gets all of them that the handler can see.
+    if isinstance(vars, Variables):
+        vars = vars.snapshot()
+    return {k: v for k, v in vars.items() if isinstance(v, PLAIN_TYPES)}
+
+def get_script_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: stats.to_dict() for name, stats in script_stats.items()}
+
+class Script:
+    def __init__(self, template: Template, name: Optional[str] = None, executor: Optional[str] = None, timeout: Optional[float] = None, is_async: bool = False):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Invalid run_script executor: '{executor}'")
+        if is_async and executor is not None:
+            raise ValueError("Async scripts run on the event loop and can't use an executor")
+        if timeout and executor is None and not is_async:
+            raise ValueError("A run_script timeout needs an executor or async='true', a script on the event loop can't be stopped")
+
+        self.template = template
+        self.executor = executor
+        self.timeout = timeout
+        self.is_async = is_async
+
+        if isinstance(template, Constant):
+            self.source = str(template.value)
+            self.code = compile_script(self.source, is_async)
+        else:
+            self.source = None
+            self.code = None
+
+        if name is None:
+            name = f'script_{get_source_hash(self.source or template.source)[:8]}'
+        self.name = name
+        self.stats = script_stats.setdefault(name, ScriptStats())
+
+    def get_code(self, vars: Dict[str, Any]) -> tuple:
+        if self.code is not None:
+            return self.source, self.code
+        source = self.template.render(vars)
+        return source, compile_script(source, self.is_async)
+
+    async def run(self, vars: Dict[str, Any], namespace: Dict[str, Any]):
+        source, code = self.get_code(vars)
+        stats = self.stats
+        start = time.perf_counter()
+
+        try:
+            if self.executor is None:
+                result = eval(code, script_globals, namespace)
+                if not asyncio.iscoroutine(result):
+                    return
+                pending = result
+            elif self.executor == 'thread':
+                pending = asyncio.get_running_loop().run_in_executor(get_pool('thread'), exec, code, script_globals, namespace)
+            else:
+                namespace = {k: v for k, v in namespace.items() if isinstance(v, PLAIN_TYPES)}
+                namespace['vars'] = get_plain_vars(vars)
+                pending = asyncio.get_running_loop().run_in_executor(get_pool('process'), run_in_process, source, namespace)
+
+            if self.timeout:
+                await asyncio.wait_for(pending, self.timeout)
+            else:
+                await pending
+
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.record(time.perf_counter() - start)
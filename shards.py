@@ -0,0 +1,62 @@
+# shards.py
+
+import os
+import yarl
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+from typing import Any, Dict, List, Optional, Tuple
+
+API_VERSION = 10
+
+def parse_ids(value: Any) -> Tuple[int, ...]:
+    if value is None or value == '':
+        return ()
+    return tuple(int(shard_id) for shard_id in str(value).replace(' ', '').split(',') if shard_id)
+
+def split_shards(shard_count: int, clusters: int) -> List[Tuple[int, ...]]:
+    if shard_count < 1:
+        raise ValueError('Shard count must be at least 1')
+    clusters = max(1, min(clusters, shard_count))
+
+    # Contiguous ranges, the first clusters get one extra shard when it does not divide evenly.
+    size, extra = divmod(shard_count, clusters)
+    ranges = []
+    start = 0
+    for cluster_id in range(clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(tuple(range(start, end)))
+        start = end
+    return ranges
+
+def get_cluster() -> Tuple[int, int]:
+    return int(os.getenv('XMLCORD_CLUSTER_ID', 0)), int(os.getenv('XMLCORD_CLUSTER_COUNT', 1))
+
+def is_primary_cluster() -> bool:
+    return get_cluster()[0] == 0
+
+def get_shard_options(tags: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    shard_ids = parse_ids(os.getenv('XMLCORD_SHARD_IDS', tags.get('shard_ids')))
+    shard_count = os.getenv('XMLCORD_SHARD_COUNT', tags.get('shard_count'))
+    sharding = tags.get('sharding', False)
+
+    if not shard_ids and shard_count is None and sharding not in ('auto', True):
+        return None
+
+    options: Dict[str, Any] = {}
+    if shard_count is not None:
+        options['shard_count'] = int(shard_count)
+    if shard_ids:
+        if 'shard_count' not in options:
+            raise ValueError('shard_ids needs shard_count to be set')
+        invalid = [shard_id for shard_id in shard_ids if not 0 <= shard_id < options['shard_count']]
+        if invalid:
+            raise ValueError(f"Invalid shard IDs for {options['shard_count']} shards: {', '.join(map(str, invalid))}")
+        options['shard_ids'] = list(shard_ids)
+    return options
+
+def use_gateway(url: str):
+    # Points discord.py at another API and gateway, e.g. the local fake gateway from fakegateway.py.
+    url = url.rstrip('/')
+    Route.BASE = f'{url}/api/v{API_VERSION}'
+    gateway = yarl.URL(url)
+    DiscordWebSocket.DEFAULT_GATEWAY = gateway.with_scheme('wss' if gateway.scheme == 'https' else 'ws').with_path('/gateway')
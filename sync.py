@@ -0,0 +1,73 @@
+# sync.py
+
+import hashlib
+import json
+import os
+import discord
+from discord import app_commands
+from typing import Dict, Iterable, Optional
+
+SYNC_FILE = '.slash_sync.json'
+
+def get_guild_ids(value) -> tuple:
+    if not value or value is True:
+        return ()
+    return tuple(int(guild_id) for guild_id in str(value).replace(' ', '').split(',') if guild_id)
+
+def get_tree_payload(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> list:
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    return sorted(payload, key=lambda command: (command.get('type', 1), command['name']))
+
+def get_tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    payload = json.dumps(get_tree_payload(tree, guild), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class CommandSyncer:
+    def __init__(self, tree: app_commands.CommandTree, guild_ids: Iterable[int] = (), path: str = SYNC_FILE):
+        self.tree = tree
+        self.guilds = tuple(discord.Object(id=guild_id) for guild_id in guild_ids)
+        self.path = path
+        self.hashes = self.load()
+        self.synced = 0
+        self.skipped = 0
+
+    def load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, 'r') as file:
+                hashes = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return hashes if isinstance(hashes, dict) else {}
+
+    def save(self):
+        temp_path = f'{self.path}.tmp'
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(self.hashes, file, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def get_scope(self, guild: Optional[discord.Object]) -> str:
+        return f"{self.tree.client.application_id}:{guild.id if guild else 'global'}"
+
+    async def sync(self, force: bool = False) -> list:
+        synced = []
+        for guild in self.guilds or (None,):
+            if guild is not None:
+                # copy_global_to() adds to the guild's commands, commands removed by a reload have to go first.
+                self.tree.clear_commands(guild=guild)
+                self.tree.copy_global_to(guild=guild)
+
+            scope = self.get_scope(guild)
+            digest = get_tree_hash(self.tree, guild)
+            if not force and self.hashes.get(scope) == digest:
+                self.skipped += 1
+                continue
+
+            synced.extend(await self.tree.sync(guild=guild))
+            self.hashes[scope] = digest
+            self.synced += 1
+            self.save()
+
+        return synced
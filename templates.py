@@ -0,0 +1,93 @@
+# templates.py
+
+import abc
+from string import Formatter
+from typing import Any, Dict, Mapping
+
+_formatter = Formatter()
+
+class Template(abc.ABC):
+    __slots__ = ('static',)
+
+    @abc.abstractmethod
+    def render(self, vars: Mapping[str, Any]) -> Any:
+        pass
+
+class Constant(Template):
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.static = True
+        self.value = value
+
+    def render(self, vars: Mapping[str, Any]) -> Any:
+        return self.value
+
+class FormatString(Template):
+    __slots__ = ('source',)
+
+    def __init__(self, source: str):
+        self.static = False
+        self.source = source
+
+    def render(self, vars: Mapping[str, Any]) -> str:
+        return self.source.format_map(vars)
+
+class DictTemplate(Template):
+    __slots__ = ('constants', 'fields')
+
+    def __init__(self, constants: Dict[str, Any], fields: tuple):
+        self.static = False
+        self.constants = constants
+        self.fields = fields
+
+    def render(self, vars: Mapping[str, Any]) -> Dict[str, Any]:
+        result = self.constants.copy()
+        for key, template in self.fields:
+            result[key] = template.render(vars)
+        return result
+
+class ListTemplate(Template):
+    __slots__ = ('items',)
+
+    def __init__(self, items: tuple):
+        self.static = False
+        self.items = items
+
+    def render(self, vars: Mapping[str, Any]) -> list:
+        return [item.render(vars) for item in self.items]
+
+def has_placeholders(value: str) -> bool:
+    return any(field is not None for _, field, _, _ in _formatter.parse(value))
+
+def compile_string(value: str) -> Template:
+    try:
+        dynamic = has_placeholders(value)
+    except ValueError:
+        # Malformed format string, keep it dynamic so it fails on render just like str.format did.
+        dynamic = True
+
+    if dynamic:
+        return FormatString(value)
+    # No fields, but '{{' and '}}' still have to be unescaped the same way str.format would.
+    return Constant(value.format() if '{' in value or '}' in value else value)
+
+def compile_template(data: Any) -> Template:
+    if isinstance(data, str):
+        return compile_string(data)
+
+    if isinstance(data, dict):
+        compiled = {key: compile_template(value) for key, value in data.items()}
+        if all(template.static for template in compiled.values()):
+            return Constant({key: template.value for key, template in compiled.items()})
+        constants = {key: template.value for key, template in compiled.items() if template.static}
+        fields = tuple((key, template) for key, template in compiled.items() if not template.static)
+        return DictTemplate(constants, fields)
+
+    if isinstance(data, list):
+        compiled = [compile_template(item) for item in data]
+        if all(template.static for template in compiled):
+            return Constant([template.value for template in compiled])
+        return ListTemplate(tuple(compiled))
+
+    return Constant(data)
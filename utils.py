@@ -0,0 +1,60 @@
+# utils.py
+
+import os
+
+def print_error(message, details=None):
+    separator = "=" * 50
+    error_header = "ERROR"
+    error_message = message
+    details_header = "Details"
+
+    print(separator)
+    print(f"{error_header:^50}")
+    print(f"{'-' * len(error_header)}")
+    print(f"{error_message}")
+    
+    if details:
+        print(f"{'-' * len(error_header)}")
+        print(f"{details_header:^50}")
+        print(f"{'-' * len(details_header)}")
+        print(f"{details}")
+    
+    print(separator)
+    exit()
+
+def get_token(config: dict) -> str:
+    tags = config['tags']
+
+    token_from_config = config.get('token')
+    if token_from_config:
+        return token_from_config
+
+    if 'token' in tags:
+        token_tag = tags['token']
+
+        if '.env' in token_tag:
+            try:
+                from dotenv import load_dotenv
+            except ImportError:
+                print_error('Module not found', 'Module \'python-dotenv\' not found. Install it with \'pip install python-dotenv\'.')
+            else:
+                load_dotenv()
+                return os.getenv('TOKEN')
+
+        elif '.yml' in token_tag:
+            try:
+                import yaml
+            except ImportError:
+                print_error('Module not found', 'Module \'pyyaml\' not found. Install it with \'pip install pyyaml\'.')
+            else:
+                with open(token_tag, 'r') as file:
+                    data = yaml.safe_load(file)
+                    return data['token']
+
+        elif '.json' in token_tag:
+            import json
+            with open(token_tag, 'r') as file:
+                data = json.load(file)
+                return data['token']
+
+    print_error('No valid token found', 'Bot token not found. Ensure it\'s in the <token>...</token> tag or in a .env, config.json, or config.yml file. If in a separate file, make sure the correct path is specified in the <token> tag.')
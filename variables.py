@@ -0,0 +1,252 @@
+# variables.py
+
+import asyncio
+import json
+import os
+import sqlite3
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from filters import get_author, get_guild_id
+
+SCOPES = ('global', 'guild', 'user', 'member')
+# Template prefix of each scope, e.g. {guild_var(prefix)} or {member_var(xp)}.
+SCOPE_PREFIXES = {'var': 'global', 'guild_var': 'guild', 'user_var': 'user', 'member_var': 'member'}
+
+# Variables are owned by (guild_id, user_id): global (0, 0), guild (g, 0), user (0, u), member (g, u).
+Owner = Tuple[int, int]
+
+DELETED = object()
+
+def get_scope(value: Any) -> str:
+    scope = str(value or 'global')
+    if scope not in SCOPES:
+        raise ValueError(f"Invalid variable scope: '{scope}'")
+    return scope
+
+def get_owner(scope: str, subject: Any, id: Optional[int] = None) -> Owner:
+    if scope == 'global':
+        return (0, 0)
+
+    if scope == 'guild':
+        guild_id = id if id is not None else get_guild_id(subject)
+        if guild_id is None:
+            raise ValueError('Guild variables can only be used in a server or with an id')
+        return (guild_id, 0)
+
+    user_id = id
+    if user_id is None:
+        author = get_author(subject)
+        if author is None:
+            raise ValueError(f'{scope.capitalize()} variables can only be used with a user or an id')
+        user_id = author.id
+    if scope == 'user':
+        return (0, user_id)
+    # Like cooldowns, direct messages count per user.
+    return (get_guild_id(subject) or 0, user_id)
+
+@lru_cache(maxsize=4096)
+def parse_field(key: str) -> Optional[Tuple[str, str]]:
+    # Templates use a handful of distinct fields, parsing each one once keeps lookups cheap.
+    if not key.endswith(')'):
+        return None
+    prefix, _, name = key[:-1].partition('(')
+    scope = SCOPE_PREFIXES.get(prefix)
+    if scope is None or not name:
+        return None
+    return scope, name
+
+def to_number(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+class VariableStore:
+    # Every variable lives in memory; changes are collected and written to SQLite in batches
+    # by a worker thread, so handlers never wait for the disk.
+    def __init__(self, file: str = 'variables.db', flush_interval: float = 5.0, flush_size: int = 1000, instance: int = 0):
+        if flush_interval <= 0 or flush_size < 1:
+            raise ValueError(f"Invalid variable settings: flush_interval='{flush_interval}' flush_size='{flush_size}'")
+
+        # Values are only read from the database at startup, so every cluster process gets its own file
+        # instead of overwriting the changes of the others.
+        if instance:
+            stem, extension = os.path.splitext(file)
+            file = f'{stem}.{instance}{extension}'
+        self.file = file
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.defaults: Dict[str, Any] = {}
+        self.owners: Dict[Owner, Dict[str, Any]] = {}
+        self.dirty: Dict[Tuple[int, int, str], Any] = {}
+
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = asyncio.Lock()
+        self.flusher: Optional[asyncio.Task] = None
+        self.pending: Optional[asyncio.Task] = None
+
+        self.writes = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.errors = 0
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            connection = sqlite3.connect(self.file, timeout=10, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS variables ('
+                'guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, '
+                'PRIMARY KEY (guild_id, user_id, name)) WITHOUT ROWID'
+            )
+            self.connection = connection
+        return self.connection
+
+    def load(self):
+        # The database is only created once a variable changes, bots without runtime variables get no file.
+        if not os.path.exists(self.file):
+            return
+
+        count = 0
+        for guild_id, user_id, name, value in self.connect().execute('SELECT guild_id, user_id, name, value FROM variables'):
+            self.owners.setdefault((guild_id, user_id), {})[name] = json.loads(value)
+            count += 1
+        print(f"Loaded {count} variable(s) from '{self.file}'")
+
+    def get(self, owner: Owner, name: str) -> Any:
+        values = self.owners.get(owner)
+        if values is not None and name in values:
+            return values[name]
+        # Values from <variables> are the defaults of every scope.
+        return self.defaults[name]
+
+    def get_all(self, owner: Owner) -> Dict[str, Any]:
+        return {**self.defaults, **self.owners.get(owner, {})}
+
+    def set(self, owner: Owner, name: str, value: Any):
+        self.owners.setdefault(owner, {})[name] = value
+        self.mark(owner, name, value)
+
+    def increment(self, owner: Owner, name: str, amount: Any = 1) -> Any:
+        values = self.owners.get(owner)
+        current = values[name] if values is not None and name in values else self.defaults.get(name, 0)
+        value = to_number(current) + to_number(amount)
+        self.set(owner, name, value)
+        return value
+
+    def delete(self, owner: Owner, name: str):
+        values = self.owners.get(owner)
+        if values is None or name not in values:
+            return
+        del values[name]
+        if not values:
+            del self.owners[owner]
+        self.mark(owner, name, DELETED)
+
+    def mark(self, owner: Owner, name: str, value: Any):
+        self.dirty[owner + (name,)] = value
+        self.writes += 1
+        if len(self.dirty) >= self.flush_size and (self.pending is None or self.pending.done()):
+            self.pending = asyncio.get_running_loop().create_task(self.flush())
+
+    def write(self, dirty: Dict[Tuple[int, int, str], Any]):
+        # Runs in a worker thread, values are plain and not changed in place, so encoding them here is safe.
+        upserts = []
+        deletes = []
+        for key, value in dirty.items():
+            if value is DELETED:
+                deletes.append(key)
+            else:
+                upserts.append(key + (json.dumps(value, default=str),))
+
+        connection = self.connect()
+        with connection:
+            if upserts:
+                connection.executemany('INSERT OR REPLACE INTO variables (guild_id, user_id, name, value) VALUES (?, ?, ?, ?)', upserts)
+            if deletes:
+                connection.executemany('DELETE FROM variables WHERE guild_id = ? AND user_id = ? AND name = ?', deletes)
+
+    async def flush(self):
+        async with self.lock:
+            if not self.dirty:
+                return
+
+            dirty, self.dirty = self.dirty, {}
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.write, dirty)
+            except (sqlite3.Error, OSError) as e:
+                # Keep the batch for the next flush, changes made in the meantime are newer and win.
+                for key, value in dirty.items():
+                    self.dirty.setdefault(key, value)
+                self.errors += 1
+                print(f"Could not save variables to '{self.file}': {e}")
+                return
+
+            self.flushes += 1
+            self.flushed += len(dirty)
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self.flusher is None:
+            self.flusher = asyncio.get_running_loop().create_task(self.flush_periodically())
+
+    async def close(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
+        await self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'owners': len(self.owners),
+            'dirty': len(self.dirty),
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'errors': self.errors
+        }
+
+class Variables(dict):
+    # The vars of one handler run. Arguments and other fields are stored in the dict,
+    # variables are only looked up when a template asks for them.
+    __slots__ = ('store', 'subject')
+
+    def __init__(self, store: VariableStore, subject: Any = None, fields: Optional[Dict[str, Any]] = None):
+        if fields:
+            super().__init__(fields)
+        self.store = store
+        self.subject = subject
+
+    def __missing__(self, key: Any) -> Any:
+        field = parse_field(key) if isinstance(key, str) else None
+        if field is not None:
+            scope, name = field
+            try:
+                return self.store.get((0, 0) if scope == 'global' else get_owner(scope, self.subject), name)
+            except (ValueError, KeyError):
+                pass
+        raise KeyError(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = {}
+        for prefix, scope in SCOPE_PREFIXES.items():
+            try:
+                owner = get_owner(scope, self.subject)
+            except ValueError:
+                continue
+            values.update({f'{prefix}({name})': value for name, value in self.store.get_all(owner).items()})
+        values.update(self)
+        return values
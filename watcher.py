@@ -0,0 +1,135 @@
+# watcher.py
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+from typing import Awaitable, Callable, Optional
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+def load_inotify():
+    if not hasattr(os, 'O_NONBLOCK'):
+        return None
+
+    library = ctypes.util.find_library('c')
+    if library is None:
+        return None
+
+    try:
+        libc = ctypes.CDLL(library, use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class FileWatcher:
+    def __init__(self, path: str, callback: Callable[[], Awaitable[None]], interval: float = 1.0, delay: float = 0.3):
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.interval = interval
+        self.delay = delay
+        self.mode: Optional[str] = None
+
+        self.fd: Optional[int] = None
+        self.poll_task: Optional[asyncio.Task] = None
+        self.pending: Optional[asyncio.TimerHandle] = None
+        self.last_stat = self.get_stat()
+
+    def get_stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        if self.mode is not None:
+            return
+
+        if self.start_inotify():
+            self.mode = 'inotify'
+        else:
+            self.poll_task = asyncio.get_running_loop().create_task(self.poll())
+            self.mode = 'polling'
+
+    def stop(self):
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+            self.poll_task = None
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+        self.mode = None
+
+    def start_inotify(self) -> bool:
+        libc = load_inotify()
+        if libc is None:
+            return False
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+
+        # Watch the directory, editors often save by writing a new file and renaming it over the old one.
+        directory = os.path.dirname(self.path).encode()
+        if libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY) < 0:
+            os.close(fd)
+            return False
+
+        self.fd = fd
+        asyncio.get_running_loop().add_reader(fd, self.on_inotify)
+        return True
+
+    def on_inotify(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        name = os.path.basename(self.path).encode()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            event_name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if event_name == name:
+                self.schedule()
+
+    async def poll(self):
+        previous = self.last_stat
+        while True:
+            await asyncio.sleep(self.interval)
+            stat = self.get_stat()
+            if stat != previous:
+                previous = stat
+                if stat is not None:
+                    self.schedule()
+
+    def schedule(self):
+        # Saves usually come as several events, wait until they settle and reload once.
+        loop = asyncio.get_running_loop()
+        if self.pending is not None:
+            self.pending.cancel()
+        self.pending = loop.call_later(self.delay, self.fire)
+
+    def fire(self):
+        self.pending = None
+        stat = self.get_stat()
+        if stat is None or stat == self.last_stat:
+            return
+        self.last_stat = stat
+        asyncio.get_running_loop().create_task(self.callback())